@@ -0,0 +1,49 @@
+"""add user_images.status
+
+Revision ID: 3f2a9c71d5e4
+Revises:
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c71d5e4'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("user_images"):
+        # The app never runs create_all, so a database without the table gets it here
+        op.create_table(
+            "user_images",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("user_id", sa.String()),
+            sa.Column("public_id", sa.String(), unique=True),
+            sa.Column("image_url", sa.String()),
+            sa.Column("original_filename", sa.String()),
+            sa.Column("file_size", sa.Integer()),
+            sa.Column("image_type", sa.String()),
+            sa.Column("status", sa.String(), server_default="ready"),
+            sa.Column("uploaded_at", sa.DateTime()),
+        )
+        op.create_index("ix_user_images_user_id", "user_images", ["user_id"])
+        return
+
+    # Existing images were all uploaded synchronously, so they backfill as ready
+    if "status" not in {c["name"] for c in inspector.get_columns("user_images")}:
+        op.add_column("user_images", sa.Column("status", sa.String(), nullable=True, server_default="ready"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("user_images") as batch_op:
+        batch_op.drop_column("status")
@@ -0,0 +1,39 @@
+"""add user_images.content_hash and its lookup index
+
+Revision ID: 8b61e0d4c2a7
+Revises: 3f2a9c71d5e4
+Create Date: 2026-10-16 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b61e0d4c2a7'
+down_revision: Union[str, Sequence[str], None] = '3f2a9c71d5e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = "ix_user_images_user_id_content_hash"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("user_images"):
+        raise RuntimeError("user_images is missing; revision 3f2a9c71d5e4 should have created it")
+    # Existing rows keep a NULL hash and simply never match a re-upload
+    if "content_hash" not in {c["name"] for c in inspector.get_columns("user_images")}:
+        op.add_column("user_images", sa.Column("content_hash", sa.String(), nullable=True))
+    if INDEX_NAME not in {i["name"] for i in inspector.get_indexes("user_images")}:
+        op.create_index(INDEX_NAME, "user_images", ["user_id", "content_hash"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(INDEX_NAME, table_name="user_images")
+    with op.batch_alter_table("user_images") as batch_op:
+        batch_op.drop_column("content_hash")
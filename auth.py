@@ -1,7 +1,12 @@
 # app/auth.py
+import hashlib
 import logging
+import re
+import secrets
+import string
 from datetime import datetime, timedelta
 from typing import Optional, List
+import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
@@ -29,7 +34,6 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         # Only fallback if hash looks like bcrypt
         if hashed_password.startswith("$2b$") or hashed_password.startswith("$2a$"):
             try:
-                import bcrypt
                 return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
             except Exception:
                 return False
@@ -43,7 +47,6 @@ def get_password_hash(password: str) -> str:
         # Log the error but don't expose it to user
         logging.error(f"Password hashing error: {str(e)}")
         # Fallback to simpler bcrypt if needed
-        import bcrypt
         salt = bcrypt.gensalt()
         return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
@@ -219,8 +222,6 @@ def require_user_permission(current_user: UserDB, target_user_id: str):
 # ============ PASSWORD UTILITIES ============
 def validate_password_strength(password: str) -> bool:
     """Validate password meets strength requirements"""
-    import re
-    
     if len(password) < 8:
         return False
     if not re.search(r'[A-Z]', password):
@@ -234,7 +235,6 @@ def validate_password_strength(password: str) -> bool:
 
 def get_password_strength_errors(password: str) -> List[str]:
     """Get list of password strength errors"""
-    import re
     errors = []
     
     if len(password) < 8:
@@ -283,15 +283,11 @@ def get_token_expiry(token: str) -> Optional[datetime]:
 # ============ SECURITY UTILITIES ============
 def generate_secure_random_string(length: int = 32) -> str:
     """Generate a secure random string for tokens"""
-    import secrets
-    import string
-    
     alphabet = string.ascii_letters + string.digits
     return ''.join(secrets.choice(alphabet) for _ in range(length))
 
 def hash_string(input_string: str) -> str:
     """Hash a string using SHA-256"""
-    import hashlib
     return hashlib.sha256(input_string.encode()).hexdigest()
 
 # ============ SESSION MANAGEMENT ============
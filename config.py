@@ -17,6 +17,11 @@ class Settings(BaseSettings):
     vision_model: str = "gpt-4o"
     text_model: str = "gpt-4o-mini"
     search_model: str = "gpt-4o-mini"
+    openai_max_concurrency: int = 100
+    openai_max_concurrency_per_user: int = 4
+    openai_breaker_failure_threshold: int = 5
+    openai_breaker_window_seconds: int = 10
+    openai_breaker_reset_seconds: int = 30
     
     # JWT Authentication
     secret_key: str
@@ -27,6 +32,11 @@ class Settings(BaseSettings):
     cloudinary_cloud_name: str
     cloudinary_api_key: str
     cloudinary_api_secret: str
+    image_upload_workers: int = 8
+    image_upload_max_attempts: int = 3
+    image_upload_queue_size: int = 64  # each queued upload holds up to 10 MB in memory
+    image_upload_stale_seconds: int = 900  # background uploads still pending after this were interrupted
+    image_upload_sweep_interval_seconds: int = 600
     
     # Application
     environment: str = "development"
@@ -37,6 +47,8 @@ class Settings(BaseSettings):
     enable_ai_caching: bool = True
     cache_ttl_seconds: int = 86400  # 24 hours
     max_cache_size: int = 1000
+    user_context_cache_ttl_seconds: int = 60
+    story_cache_ttl_seconds: int = 3600
     
     class Config:
         env_file = ".env"
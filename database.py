@@ -6,10 +6,11 @@ import os
 print("DATABASE_URL:", os.getenv("DATABASE_URL"))
 import time
 import hashlib
+import orjson
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.future import select
-from sqlalchemy import func
+from sqlalchemy import func, update, delete
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 
@@ -21,11 +22,17 @@ database_url = settings.database_url
 if database_url.startswith("postgres://"):
     database_url = database_url.replace("postgres://", "postgresql://", 1)
 
+def _json_serializer(value: Any) -> str:
+    """Encode JSON columns with orjson"""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
 if database_url.startswith("sqlite"):
     engine = create_async_engine(
         database_url,
         echo=False,
         future=True,
+        json_serializer=_json_serializer,
+        json_deserializer=orjson.loads,
         pool_pre_ping=True,
         pool_recycle=3600,
     )
@@ -34,6 +41,8 @@ else:
         database_url,
         echo=False,
         future=True,
+        json_serializer=_json_serializer,
+        json_deserializer=orjson.loads,
         pool_size=10,
         max_overflow=20,
         pool_pre_ping=True,
@@ -107,12 +116,15 @@ async def save_user_profile(profile_data: dict, db: AsyncSession) -> UserProfile
     return db_profile
 
 # ============ FOOD LOG FUNCTIONS ============
-async def save_food_log(log_data: dict, db: AsyncSession) -> FoodLogDB:
-    """Save a food log entry"""
+async def save_food_log(log_data: dict, db: AsyncSession, commit: bool = True) -> FoodLogDB:
+    """Save a food log entry (only flushed when commit is False)"""
     food_log = FoodLogDB(**log_data)
     db.add(food_log)
-    await db.commit()
-    await db.refresh(food_log)
+    if commit:
+        await db.commit()
+        await db.refresh(food_log)
+    else:
+        await db.flush()
     return food_log
 
 async def get_user_food_logs(
@@ -185,8 +197,8 @@ async def cache_ai_response(prompt: str, response: str, user_id: str, db: AsyncS
         await db.rollback()
 
 # ============ ACHIEVEMENT FUNCTIONS ============
-async def check_and_award_achievements(user_id: str, db: AsyncSession) -> List[UserAchievementDB]:
-    """Check for new achievements and award them"""
+async def check_and_award_achievements(user_id: str, db: AsyncSession, commit: bool = True) -> List[UserAchievementDB]:
+    """Check for new achievements and award them (only flushed when commit is False)"""
     try:
         # Get user's food log count
         logs_result = await db.execute(
@@ -240,25 +252,39 @@ async def check_and_award_achievements(user_id: str, db: AsyncSession) -> List[U
                 achievements.append(achievement)
         
         if achievements:
-            await db.commit()
-            for ach in achievements:
-                await db.refresh(ach)
+            if commit:
+                await db.commit()
+                for ach in achievements:
+                    await db.refresh(ach)
+            else:
+                await db.flush()
         
         return achievements
         
     except Exception as e:
+        if not commit:
+            # The caller owns the transaction and decides what to roll back
+            raise
         print(f"Achievement check error: {str(e)}")
         await db.rollback()
         return []
 
-async def get_user_achievements(user_id: str, db: AsyncSession) -> List[UserAchievementDB]:
-    """Get user's achievements"""
+async def get_user_achievements(user_id: str, db: AsyncSession) -> List[Dict[str, Any]]:
+    """Get user's achievements as response-shaped rows"""
     result = await db.execute(
-        select(UserAchievementDB).where(
+        select(
+            UserAchievementDB.id,
+            UserAchievementDB.achievement_name,
+            UserAchievementDB.description,
+            UserAchievementDB.points,
+            UserAchievementDB.badge_icon,
+            UserAchievementDB.earned_date,
+            UserAchievementDB.achievement_type
+        ).where(
             UserAchievementDB.user_id == user_id
         ).order_by(UserAchievementDB.earned_date.desc())
     )
-    return result.scalars().all()
+    return result.mappings().all()
 
 # ============ NOTIFICATION FUNCTIONS ============
 async def create_smart_notification(
@@ -267,9 +293,10 @@ async def create_smart_notification(
     title: str, 
     message: str, 
     scheduled_time: datetime, 
-    db: AsyncSession
+    db: AsyncSession,
+    commit: bool = True
 ) -> Optional[int]:
-    """Create a smart notification for the user"""
+    """Create a smart notification for the user (only flushed when commit is False)"""
     try:
         notification = SmartNotificationDB(
             user_id=user_id,
@@ -279,40 +306,51 @@ async def create_smart_notification(
             scheduled_time=scheduled_time
         )
         db.add(notification)
-        await db.commit()
-        await db.refresh(notification)
+        if commit:
+            await db.commit()
+            await db.refresh(notification)
+        else:
+            await db.flush()
         return notification.id
     except Exception as e:
+        if not commit:
+            raise
         print(f"Notification creation error: {str(e)}")
         await db.rollback()
         return None
 
-async def get_user_notifications(user_id: str, limit: int, db: AsyncSession) -> List[SmartNotificationDB]:
-    """Get user's smart notifications"""
+async def get_user_notifications(user_id: str, limit: int, db: AsyncSession) -> List[Dict[str, Any]]:
+    """Get user's smart notifications as response-shaped rows"""
     result = await db.execute(
-        select(SmartNotificationDB).where(
+        select(
+            SmartNotificationDB.id,
+            SmartNotificationDB.notification_type.label("type"),
+            SmartNotificationDB.title,
+            SmartNotificationDB.message,
+            SmartNotificationDB.scheduled_time,
+            SmartNotificationDB.sent,
+            SmartNotificationDB.opened
+        ).where(
             SmartNotificationDB.user_id == user_id
         ).order_by(SmartNotificationDB.scheduled_time.desc()).limit(limit)
     )
-    return result.scalars().all()
+    return result.mappings().all()
 
 async def mark_notification_opened(notification_id: int, user_id: str, db: AsyncSession) -> bool:
     """Mark notification as opened"""
     try:
         result = await db.execute(
-            select(SmartNotificationDB).where(
+            update(SmartNotificationDB)
+            .where(
                 SmartNotificationDB.id == notification_id,
                 SmartNotificationDB.user_id == user_id
             )
+            .values(opened=True)
+            .returning(SmartNotificationDB.id)
         )
-        notification = result.scalars().first()
-        
-        if not notification:
-            return False
-        
-        notification.opened = True
+        updated_id = result.scalar_one_or_none()
         await db.commit()
-        return True
+        return updated_id is not None
     except Exception as e:
         print(f"Notification update error: {str(e)}")
         await db.rollback()
@@ -338,11 +376,21 @@ async def get_daily_summary(user_id: str, date: str, db: AsyncSession) -> Option
     return result.scalar_one_or_none()
 
 # ============ NUTRITION STORY FUNCTIONS ============
-async def generate_nutrition_story(user_id: str, story_type: str, db: AsyncSession) -> Optional[Dict]:
-    """Generate a nutrition story for the user"""
+def story_period_days(story_type: str) -> int:
+    """Number of days of food logs a story covers"""
+    return 7 if story_type == "weekly" else 30
+
+async def generate_nutrition_story(
+    user_id: str, 
+    story_type: str, 
+    db: AsyncSession, 
+    logs: Optional[List[FoodLogDB]] = None
+) -> Optional[Dict]:
+    """Generate a nutrition story for the user, optionally from already fetched logs"""
     try:
         # Get user's recent food logs
-        logs = await get_recent_food_logs(user_id, 7 if story_type == "weekly" else 30, db)
+        if logs is None:
+            logs = await get_recent_food_logs(user_id, story_period_days(story_type), db)
         
         if not logs:
             return None
@@ -374,7 +422,7 @@ async def generate_nutrition_story(user_id: str, story_type: str, db: AsyncSessi
         
         # Save story to database
         end_date = datetime.now()
-        start_date = end_date - timedelta(days=7 if story_type == "weekly" else 30)
+        start_date = end_date - timedelta(days=story_period_days(story_type))
         
         story = NutritionStoryDB(
             user_id=user_id,
@@ -420,14 +468,25 @@ async def save_ai_recipe(recipe_data: dict, db: AsyncSession) -> AIRecipeDB:
     await db.refresh(recipe)
     return recipe
 
-async def get_user_recipes(user_id: str, limit: int, db: AsyncSession) -> List[AIRecipeDB]:
-    """Get user's saved AI-generated recipes"""
+async def get_user_recipes(user_id: str, limit: int, db: AsyncSession) -> List[Dict[str, Any]]:
+    """Get user's saved AI-generated recipes as response-shaped rows"""
     result = await db.execute(
-        select(AIRecipeDB).where(
+        select(
+            AIRecipeDB.id.label("recipe_id"),
+            AIRecipeDB.recipe_name,
+            AIRecipeDB.description,
+            AIRecipeDB.nutrition_info,
+            AIRecipeDB.prep_time,
+            AIRecipeDB.cook_time,
+            AIRecipeDB.difficulty_level,
+            AIRecipeDB.tags,
+            AIRecipeDB.user_rating,
+            AIRecipeDB.created_at
+        ).where(
             AIRecipeDB.user_id == user_id
         ).order_by(AIRecipeDB.created_at.desc()).limit(limit)
     )
-    return result.scalars().all()
+    return result.mappings().all()
 
 async def rate_recipe(recipe_id: int, user_id: str, rating: float, db: AsyncSession) -> bool:
     """Rate an AI-generated recipe"""
@@ -496,6 +555,36 @@ async def save_user_image(image_data: dict, db: AsyncSession) -> UserImageDB:
     await db.refresh(image)
     return image
 
+async def finalize_user_image(image_id: str, image_url: Optional[str], status: str, db: AsyncSession):
+    """Record the outcome of a background image upload"""
+    await db.execute(
+        update(UserImageDB)
+        .where(UserImageDB.id == image_id)
+        .values(image_url=image_url, status=status)
+    )
+    await db.commit()
+
+async def get_stale_image_uploads(older_than: datetime, db: AsyncSession) -> List[UserImageDB]:
+    """Get background uploads still pending since before older_than"""
+    result = await db.execute(
+        select(UserImageDB).where(
+            UserImageDB.status == "uploading",
+            UserImageDB.uploaded_at < older_than
+        )
+    )
+    return result.scalars().all()
+
+async def delete_stale_image_uploads(image_ids: List[str], db: AsyncSession) -> int:
+    """Delete pending upload rows, skipping any that finished in the meantime"""
+    result = await db.execute(
+        delete(UserImageDB).where(
+            UserImageDB.id.in_(image_ids),
+            UserImageDB.status == "uploading"
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
 async def get_user_images(user_id: str, image_type: Optional[str], limit: int, db: AsyncSession) -> List[UserImageDB]:
     """Get user's images with optional filtering"""
     query = select(UserImageDB).where(UserImageDB.user_id == user_id)
@@ -529,6 +618,44 @@ async def delete_user_image_from_db(user_id: str, image_id: str, db: AsyncSessio
         await db.commit()
     return image
 
+async def get_user_image_by_hash(
+    user_id: str, 
+    content_hash: str, 
+    image_type: str, 
+    db: AsyncSession
+) -> Optional[UserImageDB]:
+    """Get a finished upload of the same image content for the user"""
+    result = await db.execute(
+        select(UserImageDB).where(
+            UserImageDB.user_id == user_id,
+            UserImageDB.content_hash == content_hash,
+            UserImageDB.image_type == image_type,
+            UserImageDB.status == "ready"
+        ).limit(1)
+    )
+    return result.scalar_one_or_none()
+
+async def get_user_images_by_ids(user_id: str, image_ids: List[str], db: AsyncSession) -> List[UserImageDB]:
+    """Get several user images in one query"""
+    result = await db.execute(
+        select(UserImageDB).where(
+            UserImageDB.id.in_(image_ids),
+            UserImageDB.user_id == user_id
+        )
+    )
+    return result.scalars().all()
+
+async def delete_user_images_from_db(user_id: str, image_ids: List[str], db: AsyncSession) -> int:
+    """Delete several user images in one statement and return how many were removed"""
+    result = await db.execute(
+        delete(UserImageDB).where(
+            UserImageDB.id.in_(image_ids),
+            UserImageDB.user_id == user_id
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
 async def delete_user_image(user_id: str, image_id: str, db: AsyncSession) -> Optional[UserImageDB]:
     """Alias for delete_user_image_from_db for compatibility with services.py"""
     return await delete_user_image_from_db(user_id, image_id, db)
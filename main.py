@@ -1,29 +1,26 @@
 # app/main.py
+import asyncio
 import os
-import time
 import sys
 import traceback
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, select
-from dotenv import load_dotenv
+from sqlalchemy import select
+import cloudinary
+from openai import OpenAI
 
 from config import settings
-from models import User, UserCreate, UserLogin, MealRequest, MealResponse, NutritionistRequest, NutritionistResponse, PersonalizedNutritionistRequest, PersonalizedNutritionistResponse, SearchRequest, SearchResponse, SubstituteRequest, SubstituteResponse, SaveFoodLogRequest, FoodLogResponse, UserProfile, ImageUploadResponse, UserImageResponse, DailySummaryRequest, DailySummaryResponse, AIRecipeRequest, AIRecipeResponse, SmartDinnerPredictionRequest, SmartDinnerPredictionResponse, NutritionTimeTravelRequest, NutritionTimeTravelResponse, Token, UserDB, AchievementResponse
-from database import (
-    get_db, save_food_log, get_user_food_logs, get_dinner_predictions, get_time_travel_scenarios,
-    get_user_profile, save_user_profile, get_cached_ai_response, cache_ai_response,
-    check_and_award_achievements, create_smart_notification, get_user_notifications,
-    mark_notification_opened, save_daily_summary, get_daily_summary, generate_nutrition_story,
-    get_nutrition_story, save_ai_recipe, get_user_recipes, rate_recipe, save_dinner_prediction,
-    save_time_travel_projection, save_user_image, get_user_images, get_user_image_by_id,
-    delete_user_image_from_db, get_database_stats, get_user_achievements, get_recent_food_logs
-)
-from auth import register_user, login_user, get_current_active_user, get_current_user_optional, verify_user_access, get_current_user
-from services import create_services
+from models import User, UserCreate, UserLogin, MealRequest, MealResponse, NutritionistRequest, NutritionistResponse, PersonalizedNutritionistRequest, PersonalizedNutritionistResponse, SearchRequest, SearchResponse, SubstituteRequest, SubstituteResponse, SaveFoodLogRequest, FoodLogResponse, UserProfile, ImageUploadResponse, ImageBulkDeleteRequest, UserImageResponse, DailySummaryRequest, DailySummaryResponse, AIRecipeRequest, AIRecipeResponse, SmartDinnerPredictionRequest, SmartDinnerPredictionResponse, NutritionTimeTravelRequest, NutritionTimeTravelResponse, Token, UserDB, AchievementResponse
+# Several endpoints share a name with the helper they call, so those go through the module
+import database
+from database import AsyncSessionLocal, get_db, get_dinner_predictions, get_user_profile, get_daily_summary, get_user_images
+from auth import create_access_token, register_user, login_user, get_current_active_user, get_current_user_optional, verify_user_access, get_current_user
+from services import create_services, MAX_IMAGE_BYTES
 import utils
 
 try:
@@ -35,10 +32,19 @@ except Exception as e:
     sys.exit(1)
 
 # ============ CREATE FASTAPI APP ============
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run background maintenance for the lifetime of the app"""
+    upload_sweeper = asyncio.create_task(image_service.run_upload_sweeper())
+    yield
+    upload_sweeper.cancel()
+
 app = FastAPI(
     title="AINUT API",
     version="6.0",
-    description="AI-Powered Nutrition Assistant with comprehensive meal analysis and personalized advice"
+    description="AI-Powered Nutrition Assistant with comprehensive meal analysis and personalized advice",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # ============ CORS CONFIGURATION ============
@@ -171,7 +177,7 @@ async def get_nutrition_advice(
         user_id = current_user.username if current_user else None
         
         advice = await ai_service.get_nutrition_advice(
-            food_log=[item.dict() for item in request.food_log],
+            food_log=request.model_dump(include={"food_log"})["food_log"],
             daily_targets=request.daily_targets,
             user_id=user_id,
             db=db
@@ -332,7 +338,7 @@ async def get_user_achievements_endpoint(
     await verify_user_access(user_id, current_user)
     
     try:
-        achievements = await get_user_achievements(user_id, db)
+        achievements = await database.get_user_achievements(user_id, db)
         return achievements
     except Exception as e:
         print(f"Error fetching achievements for user {user_id}: {str(e)}")
@@ -370,7 +376,8 @@ async def upload_public_image(file: UploadFile = File(...)):
         if not file.content_type.startswith('image/'):
             raise HTTPException(400, "File must be an image")
         
-        contents = await file.read()
+        # Read at most one byte past the limit so oversized uploads are rejected without buffering them whole
+        contents = await file.read(MAX_IMAGE_BYTES + 1)
         image_url = await image_service.upload_public_image(contents, file.filename)
         
         return {"image_url": image_url}
@@ -384,6 +391,7 @@ async def upload_public_image(file: UploadFile = File(...)):
 async def upload_user_image(
     file: UploadFile = File(...),
     image_type: str = Form(default="meal"),
+    background: bool = Form(default=False),
     current_user: UserDB = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -392,14 +400,16 @@ async def upload_user_image(
         if not file.content_type.startswith('image/'):
             raise HTTPException(400, "File must be an image")
         
-        contents = await file.read()
+        # Read at most one byte past the limit so oversized uploads are rejected without buffering them whole
+        contents = await file.read(MAX_IMAGE_BYTES + 1)
         
         result = await image_service.upload_user_image(
             file_content=contents,
             filename=file.filename,
             image_type=image_type,
             user_id=current_user.username,
-            db=db
+            db=db,
+            background=background
         )
         
         return ImageUploadResponse(**result)
@@ -431,6 +441,7 @@ async def get_user_images_endpoint(
                 original_filename=img.original_filename,
                 file_size=img.file_size,
                 image_type=img.image_type,
+                status=img.status or "ready",
                 uploaded_at=img.uploaded_at
             )
             for img in images
@@ -464,6 +475,25 @@ async def delete_user_image_endpoint(
         print(f"Image deletion endpoint error: {str(e)}")
         raise HTTPException(500, f"Failed to delete image: {str(e)}")
 
+@app.post("/users/{user_id}/images/bulk-delete")
+async def delete_user_images_endpoint(
+    user_id: str,
+    request: ImageBulkDeleteRequest,
+    current_user: UserDB = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete several of the user's images at once"""
+    try:
+        if current_user.username != user_id:
+            raise HTTPException(403, "Access denied")
+        deleted = await image_service.delete_user_images(user_id, request.image_ids, db)
+        return {"success": True, "deleted": deleted}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Bulk image deletion endpoint error: {str(e)}")
+        raise HTTPException(500, f"Failed to delete images: {str(e)}")
+
 # ============ ACHIEVEMENT ENDPOINTS ============
 @app.get("/users/{user_id}/achievements")
 async def get_user_achievements(
@@ -495,7 +525,7 @@ async def get_user_notifications(
         if current_user.username != user_id:
             raise HTTPException(403, "Access denied")
         
-        return await get_user_notifications(user_id, limit, db)
+        return await database.get_user_notifications(user_id, limit, db)
     except HTTPException:
         raise
     except Exception as e:
@@ -515,7 +545,7 @@ async def mark_notification_opened(
         if current_user.username != user_id:
             raise HTTPException(403, "Access denied")
         
-        success = await mark_notification_opened(user_id, notification_id, db)
+        success = await database.mark_notification_opened(notification_id, user_id, db)
         
         if success:
             return {"message": "Notification marked as opened"}
@@ -542,7 +572,7 @@ async def get_nutrition_story(
         if current_user.username != user_id:
             raise HTTPException(403, "Access denied")
         
-        return await get_nutrition_story(user_id, story_type, db)
+        return await story_service.get_or_generate_nutrition_story(user_id, story_type, db)
     except HTTPException:
         raise
     except Exception as e:
@@ -562,10 +592,10 @@ async def save_daily_summary(
         if current_user.username != request.user_id:
             raise HTTPException(403, "Access denied")
         
-        summary_data = request.dict()
+        summary_data = request.model_dump()
         summary_data["created_at"] = datetime.utcnow()
         
-        summary = await save_daily_summary(summary_data, db)
+        summary = await database.save_daily_summary(summary_data, db)
         
         return {"message": "Daily summary saved", "summary_id": summary.id}
     except HTTPException:
@@ -696,7 +726,7 @@ async def get_smart_dinner_prediction(
             raise HTTPException(403, "Access denied")
         
         # Get today's food logs
-        today_logs = await get_user_food_logs(request.user_id, request.prediction_date, 50, db)
+        today_logs = await database.get_user_food_logs(request.user_id, request.prediction_date, 50, db)
         
         # Get user's daily targets
         profile = await get_user_profile(request.user_id, db)
@@ -704,16 +734,10 @@ async def get_smart_dinner_prediction(
             raise HTTPException(404, "User nutrition goals not found")
         
         # Calculate current intake
-        current_intake = {"calories": 0, "protein_g": 0, "carbs_g": 0, "fat_g": 0}
-        for log in today_logs:
-            for food in log.foods:
-                current_intake["calories"] += food.get("calories", 0)
-                current_intake["protein_g"] += food.get("protein_g", 0)
-                current_intake["carbs_g"] += food.get("carbs_g", 0)
-                current_intake["fat_g"] += food.get("fat_g", 0)
+        current_intake = utils.total_food_log_macros(food for log in today_logs for food in log.foods)
         
         # Get user context
-        user_context = build_user_context(profile)
+        user_context = utils.build_user_context(profile)
         
         prediction = await ai_service.predict_dinner(
             current_intake=current_intake,
@@ -809,7 +833,7 @@ async def get_time_travel_scenarios(
         if current_user.username != user_id:
             raise HTTPException(403, "Access denied")
         
-        scenarios = await get_time_travel_scenarios(user_id, limit, db)
+        scenarios = await database.get_time_travel_scenarios(user_id, limit, db)
         
         return [
             {
@@ -857,7 +881,7 @@ async def debug_test_nutrition_advice(
         
         # Test personalized advice
         profile = await get_user_profile(user_id, db)
-        user_context = build_user_context(profile) if profile else None
+        user_context = utils.build_user_context(profile) if profile else None
         
         advice = await ai_service.get_nutrition_advice(
             food_log=test_food_log,
@@ -913,7 +937,6 @@ async def health_check():
             health_status["services"]["openai"] = f"unhealthy: {str(e)}"
             health_status["status"] = "degraded"
         try:
-            import cloudinary
             cloudinary.config(
                 cloud_name=settings.cloudinary_cloud_name,
                 api_key=settings.cloudinary_api_key,
@@ -1,7 +1,7 @@
 # app/models.py
 from pydantic import BaseModel, Field, EmailStr, HttpUrl, validator
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, String, JSON, Float, Integer, Text, DateTime, Boolean
+from sqlalchemy import Column, String, JSON, Float, Integer, Text, DateTime, Boolean, Index, func
 from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
 from uuid import uuid4
@@ -161,6 +161,7 @@ class NutritionTimeTravelDB(Base):
 
 class UserImageDB(Base):
     __tablename__ = "user_images"
+    __table_args__ = (Index("ix_user_images_user_id_content_hash", "user_id", "content_hash"),)
     
     id = Column(String, primary_key=True, default=lambda: str(uuid4()))
     user_id = Column(String, index=True)
@@ -169,7 +170,9 @@ class UserImageDB(Base):
     original_filename = Column(String)
     file_size = Column(Integer)
     image_type = Column(String)
-    uploaded_at = Column(DateTime, default=datetime.utcnow)
+    status = Column(String, default="ready", server_default="ready")  # uploading, ready, failed
+    content_hash = Column(String)
+    uploaded_at = Column(DateTime, default=func.now())
 
 # ============ PYDANTIC SCHEMAS ============
 
@@ -451,18 +454,23 @@ class NutritionStory(BaseModel):
 class ImageUploadResponse(BaseModel):
     success: bool
     image_id: str
-    url: str
+    url: Optional[str] = None
     public_id: str
     image_type: str
+    status: str = "ready"
     uploaded_at: datetime
 
+class ImageBulkDeleteRequest(BaseModel):
+    image_ids: List[str] = Field(..., min_length=1, max_length=500)
+
 class UserImageResponse(BaseModel):
     image_id: str
     public_id: str
-    url: str
+    url: Optional[str] = None
     original_filename: Optional[str]
     file_size: int
     image_type: str
+    status: str = "ready"
     uploaded_at: datetime
 
 class ErrorResponse(BaseModel):
@@ -1,33 +1,134 @@
 # app/services.py
 import asyncio
 import hashlib
-import json
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
-from openai import OpenAI
+import io
+import logging
+import os
+import secrets
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, AsyncIterator
+import cloudinary
+import cloudinary.utils
+import httpx
+from cachetools import TTLCache
+from PIL import Image
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import settings
 from models import *
 from database import (
-    get_user_profile, save_user_profile, save_food_log, get_user_food_logs,
+    AsyncSessionLocal, get_user_profile, save_user_profile, save_food_log, get_user_food_logs,
     get_cached_ai_response, cache_ai_response, check_and_award_achievements,
     create_smart_notification, get_user_notifications, mark_notification_opened,
     save_ai_recipe, get_user_recipes, rate_recipe, save_dinner_prediction,
-    save_time_travel_projection, save_user_image, get_user_images,
-    get_user_image_by_id, delete_user_image_from_db, get_database_stats,
+    save_time_travel_projection, save_user_image,
+    get_user_image_by_id, delete_user_image_from_db, finalize_user_image, get_user_image_by_hash,
+    get_user_images_by_ids, get_stale_image_uploads, delete_stale_image_uploads,
+    delete_user_images_from_db,
     get_user_achievements, get_recent_food_logs, generate_nutrition_story,
-    get_nutrition_story, save_daily_summary, get_daily_summary
+    get_nutrition_story, story_period_days
 )
-from utils import AI_PERSONALITIES, generic_nutrition_prompt, create_fallback_nutrition_response, create_nutrition_advice_prompt
+from utils import (
+    AI_PERSONALITIES, create_fallback_nutrition_response, create_nutrition_advice_prompt,
+    NUTRITION_ADVICE_RESPONSE_SCHEMA, parse_nutrition_advice_response,
+    meal_analysis_prompt, food_search_prompt, substitute_prompt, parse_json_response, validate_meal_response,
+    create_fallback_meal_response, calculate_remaining_needs, dinner_prediction_prompt, time_travel_prompt,
+    recipe_generation_prompt, validate_recipe_response, get_cached_substitute, cache_substitute,
+    build_user_context, NON_FOOD_INPUT_RE
+)
+
+# ============ LOGGING ============
+class RateLimitingFilter(logging.Filter):
+    """Let each message template through at most once per interval so error storms don't flood the logs"""
+    
+    def __init__(self, interval_seconds: float = 1.0, max_templates: int = 1024):
+        super().__init__()
+        self.interval_seconds = interval_seconds
+        self.max_templates = max_templates
+        self._last_emitted: Dict[tuple, float] = {}
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.levelno, record.pathname, record.lineno)
+        now = time.monotonic()
+        last = self._last_emitted.get(key)
+        if last is not None and now - last < self.interval_seconds:
+            return False
+        if len(self._last_emitted) >= self.max_templates:
+            self._last_emitted.clear()
+        self._last_emitted[key] = now
+        return True
+
+log = logging.getLogger(__name__)
+log.addFilter(RateLimitingFilter())
+
+# ============ INPUT PRE-CHECKS ============
+MIN_AI_INPUT_LENGTH = 3
+KNOWN_BAD_INPUT_TTL_SECONDS = 3600
+
+# ============ RESPONSE PARSING ============
+JSON_OBJECT_RESPONSE_FORMAT = {"type": "json_object"}
+# Strict structured output: the API guarantees the reply matches the schema
+NUTRITION_ADVICE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "nutrition_advice", "strict": True, "schema": NUTRITION_ADVICE_RESPONSE_SCHEMA},
+}
+
+REQUIRED_NUTRITION_FIELDS = frozenset({"overall_summary", "nutrients_to_focus_on", "achievements", "tips"})
+REQUIRED_SUGGESTION_FIELDS = frozenset({
+    "meal_idea", "description", "total_calories", "protein_provided", "percentage_coverage"
+})
 
 # ============ AI SERVICE ============
 class AIService:
     """AI service for OpenAI integration with caching"""
     
     def __init__(self):
-        self.client = OpenAI(api_key=settings.openai_api_key, timeout=30.0)
+        self.client = AsyncOpenAI(api_key=settings.openai_api_key, timeout=30.0)
+        # Static preamble shared by every call; kept first so providers can cache the prefix
+        self._system_msg = {
+            "role": "system",
+            "content": "You are a world-class nutrition expert. Provide responses in valid JSON format."
+        }
+        # input hash -> expiry timestamp for inputs the model could not parse
+        self._known_bad_inputs: Dict[str, float] = {}
+        # Bounded concurrency: a global budget plus a per-user share of it
+        self._semaphore = asyncio.Semaphore(settings.openai_max_concurrency)
+        self._user_semaphores: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+        # Circuit breaker: timestamps of the most recent consecutive failures
+        self._failure_times = deque(maxlen=settings.openai_breaker_failure_threshold)
+        self._breaker_open_until = 0.0
+    
+    def _input_hash(self, user_input: str, corrections: Optional[str] = None) -> str:
+        return hashlib.md5(f"{user_input.strip().lower()}:{corrections or ''}".encode()).hexdigest()
+    
+    def _should_short_circuit(self, user_input: str, corrections: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return the fallback response for inputs that can't plausibly be a meal"""
+        text = (user_input or "").strip()
+        if len(text) < MIN_AI_INPUT_LENGTH or NON_FOOD_INPUT_RE.match(text):
+            return create_fallback_meal_response()
+        
+        input_hash = self._input_hash(text, corrections)
+        expires_at = self._known_bad_inputs.get(input_hash)
+        if expires_at is not None:
+            if expires_at > time.time():
+                return create_fallback_meal_response()
+            self._known_bad_inputs.pop(input_hash, None)
+        return None
+    
+    def _mark_known_bad(self, user_input: str, corrections: Optional[str] = None):
+        """Remember an unparseable input so retries skip the OpenAI round-trips"""
+        if len(self._known_bad_inputs) >= settings.max_cache_size:
+            # Drop the oldest entry (dicts keep insertion order)
+            self._known_bad_inputs.pop(next(iter(self._known_bad_inputs)))
+        self._known_bad_inputs[self._input_hash(user_input, corrections)] = time.time() + KNOWN_BAD_INPUT_TTL_SECONDS
     
     async def analyze_meal(
         self, 
@@ -39,6 +140,12 @@ class AIService:
     ) -> Dict[str, Any]:
         """Analyze meal from image or text with caching"""
         try:
+            # Images carry the meal themselves, so only text-only requests are pre-checked
+            if not image_url:
+                short_circuit = self._should_short_circuit(user_input, corrections)
+                if short_circuit:
+                    return short_circuit
+            
             prompt = meal_analysis_prompt(user_input, corrections)
             model = settings.vision_model if image_url else settings.text_model
             
@@ -66,12 +173,14 @@ class AIService:
                 result = parse_json_response(response)
             
             if not result:
+                if not image_url:
+                    self._mark_known_bad(user_input, corrections)
                 return create_fallback_meal_response()
             
             return validate_meal_response(result)
             
-        except Exception as e:
-            print(f"Meal analysis error: {str(e)}")
+        except Exception:
+            log.exception("Meal analysis error")
             return create_fallback_meal_response()
     
     async def get_nutrition_advice(
@@ -89,90 +198,104 @@ class AIService:
                 prompt_hash = hashlib.md5(prompt.encode()).hexdigest()
                 cached = await get_cached_ai_response(prompt_hash, user_id, db)
                 if cached:
-                    result = self._parse_json_response(cached)
+                    result = parse_nutrition_advice_response(cached)
                     if result and self._validate_nutrition_response(result):
                         return result
-            response = await self._call_openai(prompt, settings.text_model, user_id=user_id)
+            response = await self._call_openai(
+                prompt, settings.text_model, user_id=user_id, response_format=NUTRITION_ADVICE_RESPONSE_FORMAT
+            )
             if settings.enable_ai_caching and db and user_id:
                 await cache_ai_response(prompt, response, user_id, db)
-            result = self._parse_json_response(response)
+            result = parse_nutrition_advice_response(response)
             if not result or not self._validate_nutrition_response(result):
-                return self._create_fallback_nutrition_response()
+                return create_fallback_nutrition_response()
             return result
-        except Exception as e:
-            print(f"Nutrition advice error: {str(e)}")
-            return self._create_fallback_nutrition_response()
+        except Exception:
+            log.exception("Nutrition advice error")
+            return create_fallback_nutrition_response()
     
     async def _call_openai(
         self, 
         prompt: str, 
         model: str, 
         image_url: Optional[str] = None,
-        user_id: Optional[str] = None
+        user_id: Optional[str] = None,
+        response_format: Optional[Dict[str, Any]] = None
     ):
-        """Internal OpenAI API call with timeout and error handling"""
+        """Internal OpenAI API call with timeout, concurrency limits and circuit breaker"""
+        if time.monotonic() < self._breaker_open_until:
+            raise HTTPException(503, "AI service temporarily unavailable")
+        
         try:
-            messages = [
-                {
-                    "role": "system",
-                    "content": "You are a world-class nutrition expert. Provide responses in valid JSON format."
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt}
-                    ]
-                }
-            ]
-            
-            if image_url:
-                messages[1]["content"].append({"type": "image_url", "image_url": {"url": image_url}})
-
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
-                model=model,
-                messages=messages,
-                response_format={"type": "json_object"},
-                user=user_id  # Pass user ID for abuse monitoring
-            )
-            
-            return response.choices[0].message.content
+            # Per-user slot first, so a user's queued calls don't sit on global slots while they wait
+            async with self._user_semaphore(user_id), self._semaphore:
+                chunks = [delta async for delta in self._stream_openai(prompt, model, image_url, user_id, response_format)]
+            self._failure_times.clear()
+            return "".join(chunks)
         
-        except asyncio.TimeoutError:
-            print("OpenAI request timed out")
+        except (asyncio.TimeoutError, APITimeoutError):
+            log.warning("OpenAI request timed out")
+            self._record_failure()
             raise HTTPException(504, "AI service timed out")
+        
+        except (RateLimitError, InternalServerError, APIConnectionError) as e:
+            log.warning("OpenAI API unavailable: %s", e)
+            self._record_failure()
+            raise HTTPException(503, "AI service temporarily unavailable")
             
-        except Exception as e:
-            print(f"OpenAI API error: {str(e)}")
+        except Exception:
+            log.exception("OpenAI API error")
             raise HTTPException(500, "AI service error")
+    
+    def _user_semaphore(self, user_id: Optional[str]):
+        """Per-user concurrency slot so one user can't exhaust the global budget"""
+        if not user_id:
+            return nullcontext()
+        semaphore = self._user_semaphores.get(user_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.openai_max_concurrency_per_user)
+            self._user_semaphores[user_id] = semaphore
+        return semaphore
+    
+    def _record_failure(self):
+        """Open the breaker when enough consecutive failures land inside the window"""
+        now = time.monotonic()
+        self._failure_times.append(now)
+        if (
+            len(self._failure_times) == self._failure_times.maxlen
+            and now - self._failure_times[0] <= settings.openai_breaker_window_seconds
+        ):
+            self._breaker_open_until = now + settings.openai_breaker_reset_seconds
+            self._failure_times.clear()
+            log.warning("OpenAI circuit breaker open for %ss", settings.openai_breaker_reset_seconds)
 
-    def _parse_json_response(self, response: str) -> Optional[Dict[str, Any]]:
-        try:
-            response = response.strip()
-            if response.startswith('```json'):
-                response = response[7:]
-            if response.endswith('```'):
-                response = response[:-3]
-            parsed = json.loads(response.strip())
-            return self._fix_nan_values(parsed)
-        except Exception as e:
-            print(f"JSON parsing error: {str(e)}")
-            return None
-
-    def _fix_nan_values(self, obj):
-        if isinstance(obj, dict):
-            return {k: self._fix_nan_values(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [self._fix_nan_values(item) for item in obj]
-        elif isinstance(obj, float) and (obj != obj):
-            return 0.0
-        elif obj in ["NaN", "nan"]:
-            return 0.0
-        return obj
+    async def _stream_openai(
+        self,
+        prompt: str,
+        model: str,
+        image_url: Optional[str] = None,
+        user_id: Optional[str] = None,
+        response_format: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Stream completion text deltas as they arrive from OpenAI"""
+        user_content = [{"type": "text", "text": prompt}]
+        if image_url:
+            user_content.append({"type": "image_url", "image_url": {"url": image_url}})
+        messages = [self._system_msg, {"role": "user", "content": user_content}]
+        
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format=response_format or JSON_OBJECT_RESPONSE_FORMAT,
+            user=user_id,  # Pass user ID for abuse monitoring
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
     def _validate_nutrition_response(self, data: Dict[str, Any]) -> bool:
-        required_fields = ["overall_summary", "nutrients_to_focus_on", "achievements", "tips"]
-        if not all(field in data for field in required_fields):
+        if not isinstance(data, dict) or not REQUIRED_NUTRITION_FIELDS.issubset(data.keys()):
             return False
         nutrients = data.get("nutrients_to_focus_on", [])
         if not nutrients:
@@ -186,43 +309,16 @@ class AIService:
             if not suggestions:
                 return False
             for suggestion in suggestions:
-                required_suggestion_fields = [
-                    "meal_idea", "description", "total_calories", 
-                    "protein_provided", "percentage_coverage"
-                ]
-                if not all(field in suggestion for field in required_suggestion_fields):
+                if not isinstance(suggestion, dict) or not REQUIRED_SUGGESTION_FIELDS.issubset(suggestion.keys()):
                     return False
         return True
 
-    def _create_fallback_nutrition_response(self) -> Dict[str, Any]:
-        return {
-            "overall_summary": "You're making great progress! Let's focus on getting some quality protein today.",
-            "nutrients_to_focus_on": [{
-                "nutrient": "protein",
-                "current_intake": 0,
-                "target": 120,
-                "deficit": 120,
-                "suggestions": [{
-                    "meal_idea": "Greek Yogurt Power Bowl",
-                    "description": "1 cup Greek yogurt + granola + fresh berries + almond butter drizzle",
-                    "total_calories": 340,
-                    "protein_provided": 25.0,
-                    "carbs_provided": 28.0,
-                    "fat_provided": 12.0,
-                    "percentage_coverage": {"protein": 21, "carbs": 11, "fat": 17},
-                    "meal_type": "snack",
-                    "easy_to_make": True,
-                    "why_perfect": "Perfect protein boost that covers 21% of your daily needs"
-                }],
-                "why_important": "Protein helps build muscle and keeps you satisfied longer"
-            }],
-            "achievements": ["You're building healthy tracking habits!"],
-            "tips": ["Focus on adding protein to your next meal or snack"]
-        }
-    
     async def search_food(self, query: str) -> Dict[str, Any]:
         """Search for food information"""
         try:
+            if len(query.strip()) < MIN_AI_INPUT_LENGTH:
+                raise HTTPException(422, "No foods found")
+            
             prompt = food_search_prompt(query)
             response = await self._call_openai(prompt, settings.search_model)
             result = parse_json_response(response)
@@ -233,8 +329,8 @@ class AIService:
             return result
         except HTTPException:
             raise
-        except Exception as e:
-            print(f"Food search error: {str(e)}")
+        except Exception:
+            log.exception("Food search error")
             raise HTTPException(500, "Search failed")
     
     async def find_substitutes(
@@ -264,8 +360,8 @@ class AIService:
             return result
         except HTTPException:
             raise
-        except Exception as e:
-            print(f"Substitute search error: {str(e)}")
+        except Exception:
+            log.exception("Substitute search error")
             raise HTTPException(500, "Substitute search failed")
     
     async def generate_recipe(
@@ -314,8 +410,8 @@ class AIService:
             
         except HTTPException:
             raise
-        except Exception as e:
-            print(f"Recipe generation error: {str(e)}")
+        except Exception:
+            log.exception("Recipe generation error")
             raise HTTPException(500, "Recipe generation failed")
     
     async def predict_dinner(
@@ -329,19 +425,16 @@ class AIService:
     ) -> Dict[str, Any]:
         """Predict optimal dinner based on daily intake"""
         try:
-            prompt = dinner_prediction_prompt(current_intake, daily_targets, user_context)
+            # Computed once and shared with the prompt builder
+            remaining_needs = calculate_remaining_needs(current_intake, daily_targets)
+            
+            prompt = dinner_prediction_prompt(current_intake, daily_targets, user_context, remaining_needs)
             response = await self._call_openai(prompt, settings.text_model, user_id=user_id)
             result = parse_json_response(response)
             
             if not result:
                 raise HTTPException(422, "Could not generate dinner prediction")
             
-            # Calculate remaining needs
-            remaining_needs = {}
-            for macro, target in daily_targets.items():
-                current = current_intake.get(macro, 0)
-                remaining_needs[macro] = max(0, target - current)
-            
             # Save prediction to database
             prediction_data = {
                 "user_id": user_id,
@@ -368,8 +461,8 @@ class AIService:
             
         except HTTPException:
             raise
-        except Exception as e:
-            print(f"Dinner prediction error: {str(e)}")
+        except Exception:
+            log.exception("Dinner prediction error")
             raise HTTPException(500, "Dinner prediction failed")
     
     async def create_time_travel_projection(
@@ -388,29 +481,24 @@ class AIService:
             if not logs:
                 raise HTTPException(404, "Not enough data for projection")
             
-            # Analyze current patterns
-            total_days = len(set(log.date_string for log in logs))
-            avg_daily_calories = sum(log.total_calories for log in logs) / max(total_days, 1)
-            
-            # Calculate average macros
-            total_protein = sum(
-                sum(food.get('protein_g', 0) for food in log.foods) 
-                for log in logs
-            )
-            total_carbs = sum(
-                sum(food.get('carbs_g', 0) for food in log.foods) 
-                for log in logs
-            )
-            total_fat = sum(
-                sum(food.get('fat_g', 0) for food in log.foods) 
-                for log in logs
-            )
-            
+            # Analyze current patterns and macro totals in a single pass over the logs
+            days = set()
+            total_calories = total_protein = total_carbs = total_fat = 0
+            for food_log in logs:
+                days.add(food_log.date_string)
+                total_calories += food_log.total_calories
+                for food in food_log.foods:
+                    total_protein += food.get('protein_g', 0)
+                    total_carbs += food.get('carbs_g', 0)
+                    total_fat += food.get('fat_g', 0)
+            
+            total_days = len(days)
+            day_count = max(total_days, 1)
             current_pattern = {
-                "avg_daily_calories": avg_daily_calories,
-                "avg_protein": total_protein / max(total_days, 1),
-                "avg_carbs": total_carbs / max(total_days, 1),
-                "avg_fat": total_fat / max(total_days, 1),
+                "avg_daily_calories": total_calories / day_count,
+                "avg_protein": total_protein / day_count,
+                "avg_carbs": total_carbs / day_count,
+                "avg_fat": total_fat / day_count,
                 "consistency_score": total_days / 30 * 100
             }
             
@@ -454,16 +542,17 @@ class AIService:
             
         except HTTPException:
             raise
-        except Exception as e:
-            print(f"Time travel projection error: {str(e)}")
+        except Exception:
+            log.exception("Time travel projection error")
             raise HTTPException(500, "Time travel projection failed")
     
 # ============ NUTRITION SERVICE ============
 class NutritionService:
     """Nutrition service for meal analysis and food logging"""
     
-    def __init__(self, ai_service: AIService):
+    def __init__(self, ai_service: AIService, story_service: Optional["StoryService"] = None):
         self.ai_service = ai_service
+        self.story_service = story_service
     
     async def analyze_meal(
         self, 
@@ -486,8 +575,8 @@ class NutritionService:
             result["analysis_method"] = "vision" if image_url else "text"
             return result
             
-        except Exception as e:
-            print(f"Meal analysis service error: {str(e)}")
+        except Exception:
+            log.exception("Meal analysis service error")
             return create_fallback_meal_response()
     
     async def save_food_log_with_achievements(
@@ -497,32 +586,49 @@ class NutritionService:
     ) -> Dict[str, Any]:
         """Save food log and check for achievements"""
         try:
-            today = datetime.now().strftime("%Y-%m-%d")
+            # Single clock read per request; timestamp columns hold naive UTC
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            today = now.date().isoformat()
             
             log_data = {
                 "user_id": request.user_id,
                 "meal_time": request.meal_time,
-                "foods": [food.dict() for food in request.foods],
+                "foods": request.model_dump(include={"foods"})["foods"],
                 "total_calories": request.total_calories,
-                "created_at": datetime.utcnow(),
+                "created_at": now,
                 "date_string": today
             }
             
-            food_log = await save_food_log(log_data, db)
-            achievements = await check_and_award_achievements(request.user_id, db)
-            
-            # Create smart notification for next meal if appropriate
-            if request.meal_time == "breakfast":
-                lunch_time = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
-                if lunch_time > datetime.now():
-                    await create_smart_notification(
-                        user_id=request.user_id,
-                        notification_type="reminder",
-                        title="Lunch Time Approaching!",
-                        message="Don't forget to log your lunch and keep up the great tracking! 🥗",
-                        scheduled_time=lunch_time,
-                        db=db
-                    )
+            # Log, achievements and reminder share one transaction and a single commit
+            food_log = await save_food_log(log_data, db, commit=False)
+            
+            achievements = []
+            try:
+                # Savepoint so a failed achievement/notification write never drops the log itself
+                async with db.begin_nested():
+                    achievements = await check_and_award_achievements(request.user_id, db, commit=False)
+                    
+                    # Create smart notification for next meal if appropriate
+                    if request.meal_time == "breakfast":
+                        lunch_time = now.replace(hour=12, minute=0, second=0, microsecond=0)
+                        if lunch_time > now:
+                            await create_smart_notification(
+                                user_id=request.user_id,
+                                notification_type="reminder",
+                                title="Lunch Time Approaching!",
+                                message="Don't forget to log your lunch and keep up the great tracking! 🥗",
+                                scheduled_time=lunch_time,
+                                db=db,
+                                commit=False
+                            )
+            except Exception:
+                log.exception("Achievement/notification error")
+                achievements = []
+            
+            await db.commit()
+            
+            if self.story_service:
+                self.story_service.invalidate_user_stories(request.user_id)
             
             return {
                 "message": "Food log saved",
@@ -539,7 +645,7 @@ class NutritionService:
             }
             
         except Exception as e:
-            print(f"Food log service error: {str(e)}")
+            log.exception("Food log service error")
             raise HTTPException(500, f"Failed to save food log: {str(e)}")
     
     async def get_personalized_advice(
@@ -557,7 +663,7 @@ class NutritionService:
             
             # Get AI advice
             advice = await self.ai_service.get_nutrition_advice(
-                [item.dict() for item in food_log],
+                [item.model_dump() for item in food_log],
                 daily_targets,
                 user_context,
                 user_id,
@@ -574,7 +680,7 @@ class NutritionService:
             return advice
             
         except Exception as e:
-            print(f"Personalized advice service error: {str(e)}")
+            log.exception("Personalized advice service error")
             raise HTTPException(500, f"Failed to get personalized advice: {str(e)}")
     
     async def get_user_food_logs(
@@ -590,23 +696,30 @@ class NutritionService:
             
             return [
                 {
-                    "id": log.id,
-                    "meal_time": log.meal_time,
-                    "foods": log.foods or [],
-                    "total_calories": log.total_calories,
-                    "created_at": log.created_at,
-                    "date_string": log.date_string
+                    "id": food_log.id,
+                    "meal_time": food_log.meal_time,
+                    "foods": food_log.foods or [],
+                    "total_calories": food_log.total_calories,
+                    "created_at": food_log.created_at,
+                    "date_string": food_log.date_string
                 }
-                for log in food_logs
+                for food_log in food_logs
             ]
         except Exception as e:
-            print(f"Food logs service error: {str(e)}")
+            log.exception("Food logs service error")
             raise HTTPException(500, f"Failed to get food logs: {str(e)}")
 
 # ============ USER SERVICE ============
 class UserService:
     """User service for profile and user management"""
     
+    def __init__(self, recipe_service: Optional["RecipeService"] = None):
+        self.recipe_service = recipe_service
+    
+    def _invalidate_user_context(self, user_id: str):
+        if self.recipe_service:
+            self.recipe_service.invalidate_user_context(user_id)
+    
     async def create_or_update_profile(
         self, 
         profile_data: UserProfile, 
@@ -614,10 +727,11 @@ class UserService:
     ) -> Dict[str, Any]:
         """Create or update user profile"""
         try:
-            await save_user_profile(profile_data.dict(), db)
+            await save_user_profile(profile_data.model_dump(), db)
+            self._invalidate_user_context(profile_data.user_id)
             return {"message": "Profile saved", "user_id": profile_data.user_id}
         except Exception as e:
-            print(f"Profile service error: {str(e)}")
+            log.exception("Profile service error")
             raise HTTPException(500, f"Failed to save profile: {str(e)}")
     
     async def get_user_profile(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
@@ -644,7 +758,7 @@ class UserService:
         except HTTPException:
             raise
         except Exception as e:
-            print(f"Get profile service error: {str(e)}")
+            log.exception("Get profile service error")
             raise HTTPException(500, f"Failed to fetch profile: {str(e)}")
     
     async def update_ai_personality(
@@ -680,6 +794,7 @@ class UserService:
             }
             
             await save_user_profile(profile_data, db)
+            self._invalidate_user_context(user_id)
             
             return {
                 "message": "AI personality updated",
@@ -690,21 +805,146 @@ class UserService:
         except HTTPException:
             raise
         except Exception as e:
-            print(f"Personality update service error: {str(e)}")
+            log.exception("Personality update service error")
             raise HTTPException(500, f"Failed to update AI personality: {str(e)}")
 
 # ============ IMAGE SERVICE ============
-import cloudinary
-import cloudinary.uploader
-from uuid import uuid4
-import filetype
-from PIL import Image
-import io
+CLOUDINARY_API_URL = "https://api.cloudinary.com/v1_1/{cloud_name}/image/{action}"
+CLOUDINARY_DELETE_CONCURRENCY = 20
+
+# Dedicated pool for CPU-bound PIL work so uploads don't queue behind other to_thread users
+image_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="image-validate")
+
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_IMAGE_PIXELS = 50_000_000
+
+# Leading signatures of the image formats PIL can open without plugins
+IMAGE_MAGIC_PREFIXES = (
+    b"\xff\xd8\xff",          # JPEG
+    b"\x89PNG\r\n\x1a\n",     # PNG
+    b"GIF87a", b"GIF89a",     # GIF
+    b"BM",                    # BMP
+    b"II*\x00", b"MM\x00*",   # TIFF
+)
+
+def _has_image_magic(header: bytes) -> bool:
+    """Check the leading bytes for a known image signature"""
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return True
+    return header.startswith(IMAGE_MAGIC_PREFIXES)
+
+# Shared keep-alive connection pool for Cloudinary REST calls, so uploads skip the TLS handshake
+cloudinary_http = httpx.AsyncClient(
+    timeout=httpx.Timeout(60.0, connect=10.0),
+    # Pool limits must live on the transport; the client ignores limits= when transport= is given.
+    # retries covers failed connection attempts only; upload retries with backoff live in UploadPipeline
+    transport=httpx.AsyncHTTPTransport(
+        retries=3,
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=60.0)
+    )
+)
+
+def _signed_cloudinary_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Sign request params the same way the Cloudinary SDK does"""
+    signed = {
+        key: ("true" if value else "false") if isinstance(value, bool) else value
+        for key, value in params.items()
+        if value is not None
+    }
+    signed["timestamp"] = int(time.time())
+    signed["signature"] = cloudinary.utils.api_sign_request(signed, settings.cloudinary_api_secret)
+    signed["api_key"] = settings.cloudinary_api_key
+    return signed
+
+async def cloudinary_upload(file_content: bytes, filename: str = "image", **params) -> Dict[str, Any]:
+    """Upload an image through Cloudinary's REST API on the event loop"""
+    response = await cloudinary_http.post(
+        CLOUDINARY_API_URL.format(cloud_name=settings.cloudinary_cloud_name, action="upload"),
+        data=_signed_cloudinary_params(params),
+        files={"file": (filename or "image", file_content)}
+    )
+    response.raise_for_status()
+    return response.json()
+
+async def cloudinary_destroy(public_id: str, **params) -> Dict[str, Any]:
+    """Delete an image through Cloudinary's REST API on the event loop"""
+    response = await cloudinary_http.post(
+        CLOUDINARY_API_URL.format(cloud_name=settings.cloudinary_cloud_name, action="destroy"),
+        data=_signed_cloudinary_params({"public_id": public_id, **params})
+    )
+    response.raise_for_status()
+    return response.json()
+
+class UploadPipeline:
+    """Bounded worker pool that pushes background uploads to Cloudinary off the request path"""
+    
+    def __init__(
+        self,
+        workers: int = settings.image_upload_workers,
+        max_attempts: int = settings.image_upload_max_attempts,
+        max_queued: int = settings.image_upload_queue_size
+    ):
+        self._worker_count = workers
+        self._max_attempts = max_attempts
+        self._max_queued = max_queued
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        # image_id -> future resolved with the secure_url (None when the upload failed)
+        self.pending: Dict[str, asyncio.Future] = {}
+    
+    def submit(self, image_id: str, file_content: bytes, filename: str, **params) -> asyncio.Future:
+        """Queue an upload and return a future for its secure_url"""
+        # Workers are started lazily so they bind to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._max_queued)
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self._worker_count)]
+        
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((image_id, file_content, filename, params, future))
+        except asyncio.QueueFull:
+            raise HTTPException(503, "Image upload queue is full, please retry shortly", headers={"Retry-After": "5"})
+        self.pending[image_id] = future
+        return future
+    
+    async def wait(self, image_id: str) -> Optional[str]:
+        """Wait for an in-flight upload to settle, if there is one"""
+        future = self.pending.get(image_id)
+        return await asyncio.shield(future) if future else None
+    
+    async def _worker(self):
+        while True:
+            image_id, file_content, filename, params, future = await self._queue.get()
+            image_url = None
+            try:
+                image_url = await self.upload_with_retry(file_content, filename, params)
+                async with AsyncSessionLocal() as db:
+                    await finalize_user_image(image_id, image_url, "ready" if image_url else "failed", db)
+            except Exception:
+                log.exception("Background upload finalize error")
+            finally:
+                self.pending.pop(image_id, None)
+                if not future.done():
+                    future.set_result(image_url)
+                self._queue.task_done()
+    
+    async def upload_with_retry(self, file_content: bytes, filename: str, params: Dict[str, Any]) -> Optional[str]:
+        """Upload with exponential backoff, returning the secure_url or None once attempts run out"""
+        for attempt in range(self._max_attempts):
+            try:
+                upload_result = await cloudinary_upload(file_content, filename, **params)
+                return upload_result.get("secure_url")
+            except Exception as e:
+                log.warning("Upload attempt %d error: %s", attempt + 1, e)
+                if attempt + 1 < self._max_attempts:
+                    await asyncio.sleep(2 ** attempt)
+        return None
 
 class ImageService:
     """Image service for Cloudinary integration"""
     
-    def __init__(self):
+    def __init__(self, upload_pipeline: Optional[UploadPipeline] = None):
+        self.upload_pipeline = upload_pipeline or UploadPipeline()
         cloudinary.config(
             cloud_name=settings.cloudinary_cloud_name,
             api_key=settings.cloudinary_api_key,
@@ -714,21 +954,22 @@ class ImageService:
     async def upload_public_image(self, file_content: bytes, filename: str) -> str:
         """Upload public image to Cloudinary"""
         try:
-            # Validate file
-            self._validate_image(file_content)
+            # Validate file (PIL parsing is CPU-bound, keep it off the event loop)
+            await asyncio.get_running_loop().run_in_executor(image_executor, self._validate_image, file_content)
             
-            upload_result = await asyncio.to_thread(
-                cloudinary.uploader.upload,
+            upload_result = await cloudinary_upload(
                 file_content,
-                resource_type="image",
+                filename,
                 folder="nutrition_app",
-                quality="auto:good"
+                transformation="q_auto:good"
             )
             
             return upload_result.get("secure_url")
             
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"Public image upload error: {str(e)}")
+            log.exception("Public image upload error")
             raise HTTPException(500, f"Upload failed: {str(e)}")
     
     async def upload_user_image(
@@ -737,56 +978,77 @@ class ImageService:
         filename: str, 
         image_type: str, 
         user_id: str,
-        db: AsyncSession
+        db: AsyncSession,
+        background: bool = False
     ) -> Dict[str, Any]:
         """Upload user image with database storage"""
         try:
-            # Validate file
-            self._validate_image(file_content)
-            
-            # Generate unique public_id
-            public_id = f"user_{user_id}_{image_type}_{uuid4().hex[:8]}"
-            
-            # Upload to Cloudinary
-            upload_result = await asyncio.to_thread(
-                cloudinary.uploader.upload,
-                file_content,
-                public_id=public_id,
-                folder=f"nutai/users/{user_id}/{image_type}",
-                overwrite=False,
-                resource_type="image",
-                quality="auto:good",
-                fetch_format="auto"
+            # Validate and hash file (both CPU-bound, keep them off the event loop)
+            content_hash = await asyncio.get_running_loop().run_in_executor(
+                image_executor, self._validate_and_hash_image, file_content
             )
             
-            image_url = upload_result.get("secure_url")
+            # Re-uploads of the same picture reuse the existing Cloudinary asset
+            existing = await get_user_image_by_hash(user_id, content_hash, image_type, db)
+            if existing:
+                return {
+                    "success": True,
+                    "image_id": existing.id,
+                    "url": existing.image_url,
+                    "public_id": existing.public_id,
+                    "image_type": existing.image_type,
+                    "status": existing.status,
+                    "uploaded_at": existing.uploaded_at
+                }
             
-            # Save to database
+            # Generate unique public_id
+            public_id = f"user_{user_id}_{image_type}_{secrets.token_hex(4)}"
+            upload_params = {
+                "public_id": public_id,
+                "folder": f"nutai/users/{user_id}/{image_type}",
+                "overwrite": False,
+                # The REST API only applies these as an incoming transformation
+                "transformation": "q_auto:good,f_auto"
+            }
             image_data = {
                 "user_id": user_id,
                 "public_id": public_id,
-                "image_url": image_url,
                 "original_filename": filename,
                 "file_size": len(file_content),
                 "image_type": image_type,
-                "uploaded_at": datetime.utcnow()
+                "content_hash": content_hash
             }
             
-            new_image = await save_user_image(image_data, db)
+            if not background:
+                # Synchronous uploads run inline so they aren't throttled by the background workers
+                image_url = await self.upload_pipeline.upload_with_retry(file_content, filename, upload_params)
+                if not image_url:
+                    raise HTTPException(500, "Image upload failed")
+                new_image = await save_user_image({**image_data, "image_url": image_url, "status": "ready"}, db)
+            else:
+                # Save a pending row, the upload pipeline fills in the URL
+                new_image = await save_user_image({**image_data, "image_url": None, "status": "uploading"}, db)
+                try:
+                    self.upload_pipeline.submit(new_image.id, file_content, filename, **upload_params)
+                except HTTPException:
+                    # Queue is full, drop the pending row so it isn't left dangling
+                    await delete_user_image_from_db(user_id, new_image.id, db)
+                    raise
             
             return {
                 "success": True,
                 "image_id": new_image.id,
-                "url": image_url,
+                "url": new_image.image_url,
                 "public_id": public_id,
                 "image_type": image_type,
+                "status": new_image.status,
                 "uploaded_at": new_image.uploaded_at
             }
             
         except HTTPException:
             raise
         except Exception as e:
-            print(f"User image upload error: {str(e)}")
+            log.exception("User image upload error")
             raise HTTPException(500, f"Image upload failed: {str(e)}")
     
     async def delete_user_image(
@@ -802,11 +1064,14 @@ class ImageService:
             if not image:
                 raise HTTPException(404, "Image not found")
             
+            # Let an in-flight upload land first so there is an asset to destroy
+            await self.upload_pipeline.wait(image.id)
+            
             # Delete from Cloudinary
             try:
-                await asyncio.to_thread(cloudinary.uploader.destroy, image.public_id)
-            except Exception as e:
-                print(f"Cloudinary deletion error: {str(e)}")
+                await cloudinary_destroy(image.public_id)
+            except Exception:
+                log.exception("Cloudinary deletion error")
                 # Continue with database deletion even if Cloudinary fails
             
             # Delete from database
@@ -817,26 +1082,99 @@ class ImageService:
         except HTTPException:
             raise
         except Exception as e:
-            print(f"Image deletion error: {str(e)}")
+            log.exception("Image deletion error")
             raise HTTPException(500, f"Failed to delete image: {str(e)}")
     
+    async def delete_user_images(
+        self, 
+        user_id: str, 
+        image_ids: List[str], 
+        db: AsyncSession
+    ) -> int:
+        """Delete several user images, destroying the Cloudinary assets concurrently"""
+        try:
+            images = await get_user_images_by_ids(user_id, image_ids, db)
+            if not images:
+                return 0
+            
+            semaphore = asyncio.Semaphore(CLOUDINARY_DELETE_CONCURRENCY)
+            
+            async def _destroy(image: UserImageDB):
+                async with semaphore:
+                    await self.upload_pipeline.wait(image.id)
+                    await cloudinary_destroy(image.public_id)
+            
+            # Continue with database deletion even if some Cloudinary calls fail
+            results = await asyncio.gather(*(_destroy(image) for image in images), return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    log.error("Cloudinary deletion error", exc_info=result)
+            
+            return await delete_user_images_from_db(user_id, [image.id for image in images], db)
+            
+        except Exception as e:
+            log.exception("Bulk image deletion error")
+            raise HTTPException(500, f"Failed to delete images: {str(e)}")
+    
+    async def sweep_stale_uploads(self) -> int:
+        """Clean up background uploads interrupted by a restart and return how many were removed"""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.image_upload_stale_seconds)
+        async with AsyncSessionLocal() as db:
+            stale = [
+                image for image in await get_stale_image_uploads(cutoff, db)
+                if image.id not in self.upload_pipeline.pending
+            ]
+            if not stale:
+                return 0
+            
+            # The asset may have landed before the process died, so destroy it too
+            semaphore = asyncio.Semaphore(CLOUDINARY_DELETE_CONCURRENCY)
+            
+            async def _destroy(image: UserImageDB):
+                async with semaphore:
+                    await cloudinary_destroy(image.public_id)
+            
+            results = await asyncio.gather(*(_destroy(image) for image in stale), return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    log.error("Cloudinary deletion error", exc_info=result)
+            
+            removed = await delete_stale_image_uploads([image.id for image in stale], db)
+            log.info("Removed %d interrupted image uploads", removed)
+            return removed
+    
+    async def run_upload_sweeper(self):
+        """Periodically sweep interrupted uploads, starting immediately"""
+        while True:
+            try:
+                await self.sweep_stale_uploads()
+            except Exception:
+                log.exception("Stale upload sweep error")
+            await asyncio.sleep(settings.image_upload_sweep_interval_seconds)
+    
+    def _validate_and_hash_image(self, file_content: bytes) -> str:
+        """Validate image file and return its content digest"""
+        self._validate_image(file_content)
+        return hashlib.blake2b(file_content, digest_size=32).hexdigest()
+    
     def _validate_image(self, file_content: bytes):
         """Validate image file"""
         # Check file size (max 10MB)
-        if len(file_content) > 10 * 1024 * 1024:
+        if len(file_content) > MAX_IMAGE_BYTES:
             raise HTTPException(400, "Image too large (max 10MB)")
         
-        # Validate file type
-        kind = filetype.guess(file_content)
-        if not kind or not kind.mime.startswith('image/'):
+        # Validate file type from the header before touching PIL
+        if not _has_image_magic(file_content[:12]):
             raise HTTPException(400, "File must be an image")
         
-        # Validate image format using PIL
+        # Image.open only parses the header, so oversized images are rejected without decoding
         try:
-            img = Image.open(io.BytesIO(file_content))
-            img.verify()
+            width, height = Image.open(io.BytesIO(file_content)).size
         except Exception:
             raise HTTPException(400, "Invalid image format")
+        
+        if width * height > MAX_IMAGE_PIXELS:
+            raise HTTPException(400, "Image dimensions too large")
 
 # ============ NOTIFICATION SERVICE ============
 class NotificationService:
@@ -850,22 +1188,9 @@ class NotificationService:
     ) -> List[Dict[str, Any]]:
         """Get user's smart notifications"""
         try:
-            notifications = await get_user_notifications(user_id, limit, db)
-            
-            return [
-                {
-                    "id": notif.id,
-                    "type": notif.notification_type,
-                    "title": notif.title,
-                    "message": notif.message,
-                    "scheduled_time": notif.scheduled_time,
-                    "sent": notif.sent,
-                    "opened": notif.opened
-                }
-                for notif in notifications
-            ]
+            return await get_user_notifications(user_id, limit, db)
         except Exception as e:
-            print(f"Notification service error: {str(e)}")
+            log.exception("Notification service error")
             raise HTTPException(500, f"Failed to fetch notifications: {str(e)}")
     
     async def mark_notification_opened(
@@ -878,13 +1203,21 @@ class NotificationService:
         try:
             return await mark_notification_opened(notification_id, user_id, db)
         except Exception as e:
-            print(f"Notification update error: {str(e)}")
+            log.exception("Notification update error")
             raise HTTPException(500, f"Failed to update notification: {str(e)}")
 
 # ============ STORY SERVICE ============
 class StoryService:
     """Nutrition story service"""
     
+    def __init__(self):
+        # user_id -> {(story_type, utc_date): story}, so one food log clears every story of a user
+        self._story_cache = TTLCache(maxsize=settings.max_cache_size, ttl=settings.story_cache_ttl_seconds)
+    
+    def invalidate_user_stories(self, user_id: str):
+        """Drop cached stories after the user's food logs change"""
+        self._story_cache.pop(user_id, None)
+    
     async def get_or_generate_nutrition_story(
         self, 
         user_id: str, 
@@ -893,29 +1226,51 @@ class StoryService:
     ) -> Dict[str, Any]:
         """Get or generate nutrition story"""
         try:
-            # Check if we have a recent story
-            existing_story = await get_nutrition_story(user_id, story_type, db)
+            cache_key = (story_type, datetime.now(timezone.utc).date())
+            cached_story = self._story_cache.get(user_id, {}).get(cache_key)
+            if cached_story is not None:
+                return cached_story
+            
+            # Fetch the story inputs on a separate session while checking for a recent story
+            prefetch = asyncio.create_task(self._fetch_story_logs(user_id, story_type))
+            try:
+                existing_story = await get_nutrition_story(user_id, story_type, db)
+            except BaseException:
+                self._discard(prefetch)
+                raise
             
             if existing_story:
-                return {
+                self._discard(prefetch)
+                story = {
                     "title": existing_story.story_title,
                     "content": existing_story.story_content,
                     "insights": existing_story.key_insights,
                     "story_id": existing_story.id,
                     "created_at": existing_story.created_at
                 }
+            else:
+                # Generate new story
+                story = await generate_nutrition_story(user_id, story_type, db, logs=await prefetch)
+                if not story:
+                    raise HTTPException(404, "Not enough data to generate story")
             
-            # Generate new story
-            story = await generate_nutrition_story(user_id, story_type, db)
-            if not story:
-                raise HTTPException(404, "Not enough data to generate story")
-            
+            self._story_cache.setdefault(user_id, {})[cache_key] = story
             return story
         except HTTPException:
             raise
         except Exception as e:
-            print(f"Story service error: {str(e)}")
+            log.exception("Story service error")
             raise HTTPException(500, f"Failed to generate nutrition story: {str(e)}")
+    
+    async def _fetch_story_logs(self, user_id: str, story_type: str) -> List[FoodLogDB]:
+        async with AsyncSessionLocal() as session:
+            return await get_recent_food_logs(user_id, story_period_days(story_type), session)
+    
+    @staticmethod
+    def _discard(task: asyncio.Task):
+        """Cancel a prefetch that is no longer needed without leaving its exception unretrieved"""
+        task.cancel()
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
 
 # ============ ACHIEVEMENT SERVICE ============
 class AchievementService:
@@ -928,21 +1283,9 @@ class AchievementService:
     ) -> List[Dict[str, Any]]:
         """Get user's achievements"""
         try:
-            achievements = await get_user_achievements(user_id, db)
-            
-            return [
-                {
-                    "achievement_name": ach.achievement_name,
-                    "description": ach.description,
-                    "points": ach.points,
-                    "badge_icon": ach.badge_icon,
-                    "earned_date": ach.earned_date,
-                    "achievement_type": ach.achievement_type
-                }
-                for ach in achievements
-            ]
+            return await get_user_achievements(user_id, db)
         except Exception as e:
-            print(f"Achievement service error: {str(e)}")
+            log.exception("Achievement service error")
             raise HTTPException(500, f"Failed to fetch achievements: {str(e)}")
 
 # ============ RECIPE SERVICE ============
@@ -951,6 +1294,15 @@ class RecipeService:
     
     def __init__(self, ai_service: AIService):
         self.ai_service = ai_service
+        # user_id -> user context built from the profile
+        self._user_context_cache = TTLCache(
+            maxsize=settings.max_cache_size,
+            ttl=settings.user_context_cache_ttl_seconds
+        )
+    
+    def invalidate_user_context(self, user_id: str):
+        """Drop a cached user context after the profile changes"""
+        self._user_context_cache.pop(user_id, None)
     
     async def generate_custom_recipe(
         self, 
@@ -960,8 +1312,11 @@ class RecipeService:
         """Generate custom AI recipe"""
         try:
             # Get user context
-            profile = await get_user_profile(request.user_id, db)
-            user_context = build_user_context(profile) if profile else {}
+            user_context = self._user_context_cache.get(request.user_id)
+            if user_context is None:
+                profile = await get_user_profile(request.user_id, db)
+                user_context = build_user_context(profile) if profile else {}
+                self._user_context_cache[request.user_id] = user_context
             
             return await self.ai_service.generate_recipe(
                 request.target_macros,
@@ -973,7 +1328,7 @@ class RecipeService:
         except HTTPException:
             raise
         except Exception as e:
-            print(f"Recipe service error: {str(e)}")
+            log.exception("Recipe service error")
             raise HTTPException(500, f"Failed to generate recipe: {str(e)}")
     
     async def get_user_recipes(
@@ -984,25 +1339,9 @@ class RecipeService:
     ) -> List[Dict[str, Any]]:
         """Get user's saved recipes"""
         try:
-            recipes = await get_user_recipes(user_id, limit, db)
-            
-            return [
-                {
-                    "recipe_id": recipe.id,
-                    "recipe_name": recipe.recipe_name,
-                    "description": recipe.description,
-                    "nutrition_info": recipe.nutrition_info,
-                    "prep_time": recipe.prep_time,
-                    "cook_time": recipe.cook_time,
-                    "difficulty_level": recipe.difficulty_level,
-                    "tags": recipe.tags,
-                    "user_rating": recipe.user_rating,
-                    "created_at": recipe.created_at
-                }
-                for recipe in recipes
-            ]
+            return await get_user_recipes(user_id, limit, db)
         except Exception as e:
-            print(f"Recipe fetch error: {str(e)}")
+            log.exception("Recipe fetch error")
             raise HTTPException(500, f"Failed to fetch recipes: {str(e)}")
     
     async def rate_recipe(
@@ -1025,20 +1364,21 @@ class RecipeService:
         except HTTPException:
             raise
         except Exception as e:
-            print(f"Recipe rating error: {str(e)}")
+            log.exception("Recipe rating error")
             raise HTTPException(500, f"Failed to rate recipe: {str(e)}")
 
 # ============ SERVICE FACTORY ============
+@lru_cache(maxsize=1)
 def create_services() -> Dict[str, Any]:
-    """Create all service instances"""
+    """Create all service instances once and share them across callers"""
     ai_service = AIService()
-    nutrition_service = NutritionService(ai_service)
-    user_service = UserService()
-    image_service = ImageService()
-    notification_service = NotificationService()
     story_service = StoryService()
-    achievement_service = AchievementService()
+    nutrition_service = NutritionService(ai_service, story_service)
     recipe_service = RecipeService(ai_service)
+    user_service = UserService(recipe_service)
+    image_service = ImageService(UploadPipeline())
+    notification_service = NotificationService()
+    achievement_service = AchievementService()
     
     return {
         "ai_service": ai_service,
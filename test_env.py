@@ -3,21 +3,19 @@
 
 import os
 
+REQUIRED_ENV_VARS = frozenset({
+    "DATABASE_URL",
+    "OPENAI_API_KEY",
+    "SECRET_KEY",
+    "CLOUDINARY_CLOUD_NAME",
+    "CLOUDINARY_API_KEY",
+    "CLOUDINARY_API_SECRET"
+})
+
 def check_env_vars():
     """Check if required environment variables are set"""
-    required_vars = [
-        "DATABASE_URL",
-        "OPENAI_API_KEY", 
-        "SECRET_KEY",
-        "CLOUDINARY_CLOUD_NAME",
-        "CLOUDINARY_API_KEY",
-        "CLOUDINARY_API_SECRET"
-    ]
-    
-    missing_vars = []
-    for var in required_vars:
-        if not os.getenv(var):
-            missing_vars.append(var)
+    # Empty values count as missing, so a plain key difference against os.environ is not enough
+    missing_vars = sorted(var for var in REQUIRED_ENV_VARS if not os.environ.get(var))
     
     if missing_vars:
         print(f"❌ Missing environment variables: {missing_vars}")
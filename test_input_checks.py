@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""Tests for the degenerate meal input pre-check"""
+
+import unittest
+
+from utils import NON_FOOD_INPUT_RE
+
+
+class NonFoodInputTest(unittest.TestCase):
+    def test_placeholder_and_symbol_inputs_match(self):
+        for text in ("test", "Hello", "asdfgh", "n/a", "...", "123", "!!! ???", "--__--"):
+            with self.subTest(text=text):
+                self.assertIsNotNone(NON_FOOD_INPUT_RE.match(text))
+
+    def test_emoji_meal_descriptions_do_not_match(self):
+        for text in ("🍕🍔🍟", "🥗", "🍳 🥓 ☕", "2 🍩"):
+            with self.subTest(text=text):
+                self.assertIsNone(NON_FOOD_INPUT_RE.match(text))
+
+    def test_real_meals_do_not_match(self):
+        for text in ("2 eggs and toast", "chicken salad", "café au lait"):
+            with self.subTest(text=text):
+                self.assertIsNone(NON_FOOD_INPUT_RE.match(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
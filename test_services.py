@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Tests for service-layer error handling and caching"""
+
+import os
+
+# Settings are read at import; point the app at throwaway values before loading services
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("CLOUDINARY_CLOUD_NAME", "test-cloud")
+os.environ.setdefault("CLOUDINARY_API_KEY", "test-key")
+os.environ.setdefault("CLOUDINARY_API_SECRET", "test-secret")
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from fastapi import HTTPException
+
+import services
+
+
+class TimeTravelProjectionErrorTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.ai_service = services.AIService()
+
+    async def _assert_projection_fails_with_500(self):
+        with self.assertRaises(HTTPException) as ctx:
+            await self.ai_service.create_time_travel_projection("alice", "weight", {"calories": 1800}, None, db=None)
+        self.assertEqual(ctx.exception.status_code, 500)
+
+    async def test_failure_before_aggregation_returns_500(self):
+        with patch("services.get_recent_food_logs", AsyncMock(side_effect=RuntimeError("db down"))):
+            await self._assert_projection_fails_with_500()
+
+    async def test_failure_after_aggregation_returns_500(self):
+        logs = [SimpleNamespace(date_string="2026-10-15", total_calories=500, foods=[{"protein_g": 20}])]
+        with patch("services.get_recent_food_logs", AsyncMock(return_value=logs)), \
+                patch("services.get_user_profile", AsyncMock(side_effect=RuntimeError("db down"))):
+            await self._assert_projection_fails_with_500()
+
+
+class StoryCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.story_service = services.StoryService()
+        stored = SimpleNamespace(
+            id=7, story_title="Week", story_content="Good week", key_insights=[], created_at=None
+        )
+        self.get_story = AsyncMock(return_value=stored)
+        patches = [
+            patch("services.get_nutrition_story", self.get_story),
+            # Keep the speculative prefetch off the real database
+            patch.object(services.StoryService, "_fetch_story_logs", AsyncMock(return_value=[])),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    async def test_second_call_within_ttl_skips_the_database(self):
+        first = await self.story_service.get_or_generate_nutrition_story("alice", "weekly", db=None)
+        second = await self.story_service.get_or_generate_nutrition_story("alice", "weekly", db=None)
+        self.assertEqual(first, second)
+        self.assertEqual(self.get_story.await_count, 1)
+
+    async def test_invalidation_forces_a_fresh_read(self):
+        await self.story_service.get_or_generate_nutrition_story("alice", "weekly", db=None)
+        self.story_service.invalidate_user_stories("alice")
+        await self.story_service.get_or_generate_nutrition_story("alice", "weekly", db=None)
+        self.assertEqual(self.get_story.await_count, 2)
+
+
+class StoryPrefetchTest(unittest.IsolatedAsyncioTestCase):
+    async def test_miss_generates_from_prefetched_logs(self):
+        logs = [SimpleNamespace(date_string="2026-10-15")]
+        generated = {"title": "Week", "content": "Fresh story"}
+        generate = AsyncMock(return_value=generated)
+        with patch("services.get_nutrition_story", AsyncMock(return_value=None)), \
+                patch("services.generate_nutrition_story", generate), \
+                patch.object(services.StoryService, "_fetch_story_logs", AsyncMock(return_value=logs)):
+            story = await services.StoryService().get_or_generate_nutrition_story("alice", "weekly", db=None)
+        self.assertIs(story, generated)
+        self.assertIs(generate.await_args.kwargs["logs"], logs)
+
+    async def test_hit_discards_the_prefetch(self):
+        stored = SimpleNamespace(id=7, story_title="Week", story_content="Stored", key_insights=[], created_at=None)
+        generate = AsyncMock()
+        with patch("services.get_nutrition_story", AsyncMock(return_value=stored)), \
+                patch("services.generate_nutrition_story", generate), \
+                patch.object(services.StoryService, "_discard", wraps=services.StoryService._discard) as discard, \
+                patch.object(services.StoryService, "_fetch_story_logs", AsyncMock(return_value=[])):
+            story = await services.StoryService().get_or_generate_nutrition_story("alice", "weekly", db=None)
+        self.assertEqual(story["story_id"], 7)
+        generate.assert_not_awaited()
+        discard.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
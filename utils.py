@@ -1,10 +1,19 @@
 """app/utils.py - Utility functions for AINUT"""
+import hashlib
 import json
+import logging
+import math
 import re
+import string
 import time
-from typing import Dict, Any, Optional, List
-from datetime import datetime
-import asyncio
+from string import Template
+from typing import Dict, Any, Final, Optional, List, Tuple, Iterable, Union
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import orjson
+
+logger = logging.getLogger(__name__)
 
 # ============ AI PERSONALITY CONFIGURATIONS ============
 AI_PERSONALITIES = {
@@ -26,44 +35,38 @@ AI_PERSONALITIES = {
     }
 }
 
+# Personality instructions rendered once per type, ready to prefix a prompt
+_PERSONALITY_INSTRUCTIONS = {
+    personality_type: f"\nIMPORTANT: Respond with a {personality['tone']} tone. \nCommunication style: {personality['style']}\n\n\n"
+    for personality_type, personality in AI_PERSONALITIES.items()
+}
+_DEFAULT_PERSONALITY_INSTRUCTION = _PERSONALITY_INSTRUCTIONS["supportive"]
+
 def get_ai_personality_prompt(user_context: Dict, base_prompt: str) -> str:
     """Enhance prompts with AI personality"""
-    personality_type = user_context.get("ai_personality_type", "supportive")
-    personality = AI_PERSONALITIES.get(personality_type, AI_PERSONALITIES["supportive"])
-    
-    personality_instruction = f"""
-IMPORTANT: Respond with a {personality['tone']} tone. 
-Communication style: {personality['style']}
-"""
-    
-    return f"{personality_instruction}\n\n{base_prompt}"
+    instruction = _PERSONALITY_INSTRUCTIONS.get(user_context.get("ai_personality_type"), _DEFAULT_PERSONALITY_INSTRUCTION)
+    return instruction + base_prompt
 
 # ============ AI PROMPT TEMPLATES ============
-def meal_analysis_prompt(user_input: str, corrections: Optional[str] = None) -> str:
-    """Generate meal analysis prompt"""
-    corrections_text = f"\nUser corrections: {corrections}" if corrections else ""
-    return f"""
-Analyze this meal and provide ACCURATE nutrition information. Be specific and precise.
-
-Meal: {user_input}{corrections_text}
+_MEAL_ANALYSIS_PROMPT_TAIL = """
 
 Analyze each food item carefully and provide realistic portions and nutrition values.
 
 Return ONLY valid JSON:
-{{
+{
   "meal_name": "Clear, descriptive name for the meal",
   "meal_type": "breakfast/lunch/dinner/snack",
   "foods": [
-    {{
+    {
       "name": "specific food item",
       "calories": 150,
       "protein_g": 12.5,
       "carbs_g": 18.0,
       "fat_g": 4.2
-    }}
+    }
   ],
   "total_calories": 150
-}}
+}
 
 CRITICAL REQUIREMENTS:
 - meal_type MUST be one of: "breakfast", "lunch", "dinner", "snack" 
@@ -75,23 +78,103 @@ CRITICAL REQUIREMENTS:
 - Ensure total_calories matches the sum of individual food calories
 """
 
+@lru_cache(maxsize=256)
+def meal_analysis_prompt(user_input: str, corrections: Optional[str] = None) -> str:
+    """Generate meal analysis prompt"""
+    corrections_text = f"\nUser corrections: {corrections}" if corrections else ""
+    return f"""
+Analyze this meal and provide ACCURATE nutrition information. Be specific and precise.
+
+Meal: {user_input}{corrections_text}""" + _MEAL_ANALYSIS_PROMPT_TAIL
+
+def summarize_food_log(food_log: List[Dict]) -> Tuple[List[str], Dict[str, float]]:
+    """Build the per-item summary lines and macro totals in a single pass"""
+    food_summary = []
+    append = food_summary.append
+    calories = protein = carbs = fat = 0
+    for item in food_log:
+        get = item.get
+        item_calories = get("calories", 0)
+        append(f"- {get('name', 'Unknown')}: {item_calories}cal")
+        calories += item_calories
+        protein += get("protein_g", 0)
+        carbs += get("carbs_g", 0)
+        fat += get("fat_g", 0)
+    return food_summary, {"calories": calories, "protein_g": protein, "carbs_g": carbs, "fat_g": fat}
+
+def total_food_log_macros(food_log: Iterable[Dict]) -> Dict[str, float]:
+    """Sum the macros of a food log in a single pass"""
+    calories = protein = carbs = fat = 0
+    for item in food_log:
+        get = item.get
+        calories += get("calories", 0)
+        protein += get("protein_g", 0)
+        carbs += get("carbs_g", 0)
+        fat += get("fat_g", 0)
+    return {"calories": calories, "protein_g": protein, "carbs_g": carbs, "fat_g": fat}
+
+# Example meals live as Python data and are serialized once at import
+_GENERIC_SUGGESTIONS = [
+    {
+        "meal_idea": "Greek Yogurt Power Bowl",
+        "description": "1 cup Greek yogurt + 1/4 cup granola + 1 tbsp almond butter + berries",
+        "total_calories": 340,
+        "protein_provided": 25.0,
+        "carbs_provided": 28.0,
+        "fat_provided": 12.0,
+        "percentage_coverage": {"protein": 21, "carbs": 11, "fat": 17},
+        "meal_type": "snack",
+        "easy_to_make": True,
+        "why_perfect": "Quick protein boost that covers 21% of your daily protein needs in one delicious bowl"
+    },
+    {
+        "meal_idea": "Chicken & Rice Power Bowl",
+        "description": "4oz grilled chicken breast + 1/2 cup brown rice + steamed broccoli + olive oil drizzle",
+        "total_calories": 420,
+        "protein_provided": 35.0,
+        "carbs_provided": 40.0,
+        "fat_provided": 8.0,
+        "percentage_coverage": {"protein": 29, "carbs": 16, "fat": 11},
+        "meal_type": "lunch",
+        "easy_to_make": True,
+        "why_perfect": "Balanced meal that delivers nearly 30% of your daily protein target"
+    }
+]
+
+_GENERIC_NUTRITION_PROMPT_TAIL = """
+      "suggestions": """ + json.dumps(_GENERIC_SUGGESTIONS, separators=(",", ":")) + """,
+      "why_important": "Protein helps build muscle and keeps you full between meals"
+    }
+  ],
+  "achievements": ["Great job starting your nutrition tracking today!"],
+  "tips": [
+    "Focus on getting protein with every meal and snack",
+    "Try one of the meal suggestions above for your next meal"
+  ]
+}
+
+RULES:
+1. NEVER use old format with "food", "serving_size", "amount_provided"
+2. ALWAYS use "meal_idea", "description", "total_calories", "percentage_coverage"
+3. Give 2 specific meal suggestions minimum
+4. Calculate realistic percentages for daily coverage
+5. Make suggestions encouraging and specific
+"""
+
 def generic_nutrition_prompt(food_log: List[Dict], daily_targets: Dict[str, float]) -> str:
     """Generate generic nutrition advice prompt"""
-    food_summary = []
-    total_macros = {"calories": 0, "protein_g": 0, "carbs_g": 0, "fat_g": 0}
+    food_summary, total_macros = summarize_food_log(food_log)
     
-    for item in food_log:
-        food_summary.append(f"- {item.get('name', 'Unknown')}: {item.get('calories', 0)}cal")
-        total_macros["calories"] += item.get("calories", 0)
-        total_macros["protein_g"] += item.get("protein_g", 0)
-        total_macros["carbs_g"] += item.get("carbs_g", 0)
-        total_macros["fat_g"] += item.get("fat_g", 0)
+    calories_target = daily_targets.get("calories", 2000)
+    protein_target = daily_targets.get("protein_g", 120)
+    carbs_target = daily_targets.get("carbs_g", 250)
+    fat_target = daily_targets.get("fat_g", 70)
     
     # Calculate what's needed
-    calories_needed = max(0, daily_targets.get("calories", 2000) - total_macros["calories"])
-    protein_needed = max(0, daily_targets.get("protein_g", 120) - total_macros["protein_g"])
-    carbs_needed = max(0, daily_targets.get("carbs_g", 250) - total_macros["carbs_g"])
-    fat_needed = max(0, daily_targets.get("fat_g", 70) - total_macros["fat_g"])
+    calories_needed = max(0, calories_target - total_macros["calories"])
+    protein_needed = max(0, protein_target - total_macros["protein_g"])
+    carbs_needed = max(0, carbs_target - total_macros["carbs_g"])
+    fat_needed = max(0, fat_target - total_macros["fat_g"])
     
     return f"""
 You MUST return EXACTLY this JSON format with specific meal ideas:
@@ -110,69 +193,67 @@ Return EXACTLY this structure (no variations allowed):
     {{
       "nutrient": "protein",
       "current_intake": {total_macros["protein_g"]},
-      "target": {daily_targets.get("protein_g", 120)},
-      "deficit": {protein_needed},
-      "suggestions": [
-        {{
-          "meal_idea": "Greek Yogurt Power Bowl",
-          "description": "1 cup Greek yogurt + 1/4 cup granola + 1 tbsp almond butter + berries",
-          "total_calories": 340,
-          "protein_provided": 25.0,
-          "carbs_provided": 28.0,
-          "fat_provided": 12.0,
-          "percentage_coverage": {{"protein": 21, "carbs": 11, "fat": 17}},
-          "meal_type": "snack",
-          "easy_to_make": true,
-          "why_perfect": "Quick protein boost that covers 21% of your daily protein needs in one delicious bowl"
-        }},
-        {{
-          "meal_idea": "Chicken & Rice Power Bowl", 
-          "description": "4oz grilled chicken breast + 1/2 cup brown rice + steamed broccoli + olive oil drizzle",
-          "total_calories": 420,
-          "protein_provided": 35.0,
-          "carbs_provided": 40.0,
-          "fat_provided": 8.0,
-          "percentage_coverage": {{"protein": 29, "carbs": 16, "fat": 11}},
-          "meal_type": "lunch",
-          "easy_to_make": true,
-          "why_perfect": "Balanced meal that delivers nearly 30% of your daily protein target"
-        }}
-      ],
-      "why_important": "Protein helps build muscle and keeps you full between meals"
-    }}
-  ],
-  "achievements": ["Great job starting your nutrition tracking today!"],
-  "tips": [
-    "Focus on getting protein with every meal and snack",
-    "Try one of the meal suggestions above for your next meal"
-  ]
-}}
+      "target": {protein_target},
+      "deficit": {protein_needed},""" + _GENERIC_NUTRITION_PROMPT_TAIL
+
+_PERSONALIZED_SUGGESTIONS = [
+    {
+        "meal_idea": "Mediterranean Protein Bowl (matches your taste!)",
+        "description": "Grilled chicken + chickpeas + feta cheese + olive oil + cucumber + cherry tomatoes",
+        "total_calories": 380,
+        "protein_provided": 32.0,
+        "carbs_provided": 18.0,
+        "fat_provided": 16.0,
+        "percentage_coverage": {"protein": 27, "carbs": 7, "fat": 23},
+        "meal_type": "lunch",
+        "easy_to_make": True,
+        "why_perfect": "Perfect for your Mediterranean preferences and delivers 27% of your daily protein in one delicious bowl"
+    },
+    {
+        "meal_idea": "Greek Yogurt Parfait (your favorite!)",
+        "description": "1 cup Greek yogurt + mixed berries + granola + honey drizzle + chopped nuts",
+        "total_calories": 320,
+        "protein_provided": 22.0,
+        "carbs_provided": 35.0,
+        "fat_provided": 8.0,
+        "percentage_coverage": {"protein": 18, "carbs": 14, "fat": 11},
+        "meal_type": "snack",
+        "easy_to_make": True,
+        "why_perfect": "Features foods you love and gives you 18% of your daily protein target"
+    }
+]
+
+_PERSONALIZED_SUGGESTIONS_EXAMPLE = """
+      "suggestions": """ + json.dumps(_PERSONALIZED_SUGGESTIONS, separators=(",", ":")) + ","
+
+_PERSONALIZED_NUTRITION_PROMPT_TAIL = """
 
 RULES:
-1. NEVER use old format with "food", "serving_size", "amount_provided"
+1. NEVER use old format with "food", "serving_size", "amount_provided"  
 2. ALWAYS use "meal_idea", "description", "total_calories", "percentage_coverage"
-3. Give 2 specific meal suggestions minimum
-4. Calculate realistic percentages for daily coverage
-5. Make suggestions encouraging and specific
+3. Include user preferences in meal names and descriptions
+4. Avoid any allergies/dislikes completely
+5. Make it personal and encouraging
+6. Give 2 specific meal suggestions minimum
 """
 
 def personalized_nutrition_prompt(food_log: List[Dict], daily_targets: Dict[str, float], user_context: Dict[str, Any]) -> str:
     """Generate personalized nutrition advice prompt"""
-    food_summary = []
-    total_macros = {"calories": 0, "protein_g": 0, "carbs_g": 0, "fat_g": 0}
+    food_summary, total_macros = summarize_food_log(food_log)
     
-    for item in food_log:
-        food_summary.append(f"- {item.get('name', 'Unknown')}: {item.get('calories', 0)}cal")
-        total_macros["calories"] += item.get("calories", 0)
-        total_macros["protein_g"] += item.get("protein_g", 0)
-        total_macros["carbs_g"] += item.get("carbs_g", 0)
-        total_macros["fat_g"] += item.get("fat_g", 0)
+    calories_target = daily_targets.get("calories", 2000)
+    protein_target = daily_targets.get("protein_g", 120)
+    carbs_target = daily_targets.get("carbs_g", 250)
+    fat_target = daily_targets.get("fat_g", 70)
     
     # Calculate what's needed
-    calories_needed = max(0, daily_targets.get("calories", 2000) - total_macros["calories"])
-    protein_needed = max(0, daily_targets.get("protein_g", 120) - total_macros["protein_g"])
-    carbs_needed = max(0, daily_targets.get("carbs_g", 250) - total_macros["carbs_g"])
-    fat_needed = max(0, daily_targets.get("fat_g", 70) - total_macros["fat_g"])
+    calories_needed = max(0, calories_target - total_macros["calories"])
+    protein_needed = max(0, protein_target - total_macros["protein_g"])
+    carbs_needed = max(0, carbs_target - total_macros["carbs_g"])
+    fat_needed = max(0, fat_target - total_macros["fat_g"])
+    
+    unique_food_count = len({item.get('name', '') for item in food_log})
+    protein_pct = total_macros['protein_g'] / protein_target * 100 if protein_target else 0
     
     # User preferences
     likes = user_context.get("likes", [])
@@ -212,34 +293,8 @@ Return EXACTLY this structure (no variations allowed):
     {{
       "nutrient": "protein", 
       "current_intake": {total_macros["protein_g"]},
-      "target": {daily_targets.get("protein_g", 120)},
-      "deficit": {protein_needed},
-      "suggestions": [
-        {{
-          "meal_idea": "Mediterranean Protein Bowl (matches your taste!)",
-          "description": "Grilled chicken + chickpeas + feta cheese + olive oil + cucumber + cherry tomatoes",
-          "total_calories": 380,
-          "protein_provided": 32.0,
-          "carbs_provided": 18.0,
-          "fat_provided": 16.0,
-          "percentage_coverage": {{"protein": 27, "carbs": 7, "fat": 23}},
-          "meal_type": "lunch",
-          "easy_to_make": true,
-          "why_perfect": "Perfect for your Mediterranean preferences and delivers 27% of your daily protein in one delicious bowl"
-        }},
-        {{
-          "meal_idea": "Greek Yogurt Parfait (your favorite!)",
-          "description": "1 cup Greek yogurt + mixed berries + granola + honey drizzle + chopped nuts",
-          "total_calories": 320,
-          "protein_provided": 22.0,
-          "carbs_provided": 35.0,
-          "fat_provided": 8.0,
-          "percentage_coverage": {{"protein": 18, "carbs": 14, "fat": 11}},
-          "meal_type": "snack",
-          "easy_to_make": true,
-          "why_perfect": "Features foods you love and gives you 18% of your daily protein target"
-        }}
-      ],
+      "target": {protein_target},
+      "deficit": {protein_needed},""" + _PERSONALIZED_SUGGESTIONS_EXAMPLE + f"""
       "why_important": "Based on your {activity} activity level, protein helps with muscle recovery and keeps you energized"
     }}
   ],
@@ -249,229 +304,260 @@ Return EXACTLY this structure (no variations allowed):
     "Your next meal should include {likes[0] if likes else 'something you enjoy'} - try the suggestions above!"
   ],
   "personalized_insights": [
-    "You've eaten {len(set(item.get('name', '') for item in food_log))} different foods today - great variety!",
-    "Your protein intake is {(total_macros['protein_g']/daily_targets.get('protein_g', 120)*100):.0f}% of your daily goal"
+    "You've eaten {unique_food_count} different foods today - great variety!",
+    "Your protein intake is {protein_pct:.0f}% of your daily goal"
   ]
-}}
+}}""" + _PERSONALIZED_NUTRITION_PROMPT_TAIL
 
-RULES:
-1. NEVER use old format with "food", "serving_size", "amount_provided"  
-2. ALWAYS use "meal_idea", "description", "total_calories", "percentage_coverage"
-3. Include user preferences in meal names and descriptions
-4. Avoid any allergies/dislikes completely
-5. Make it personal and encouraging
-6. Give 2 specific meal suggestions minimum
+_FOOD_SEARCH_PROMPT_TAIL = """
+Return ONLY valid JSON:
+{
+  "results": [
+    {
+      "name": "food name",
+      "nutrition_per_100g": {"calories": 0, "protein_g": 0.0, "carbs_g": 0.0, "fat_g": 0.0},
+      "portion_suggestions": [{"description": "1 medium", "grams": 100}]
+    }
+  ]
+}
 """
 
+@lru_cache(maxsize=256)
 def food_search_prompt(query: str) -> str:
     """Generate food search prompt"""
     return f"""
 Find 3-5 foods matching: "{query}"
-
-Return ONLY valid JSON:
-{{
-  "results": [
-    {{
-      "name": "food name",
-      "nutrition_per_100g": {{"calories": 0, "protein_g": 0.0, "carbs_g": 0.0, "fat_g": 0.0}},
-      "portion_suggestions": [{{"description": "1 medium", "grams": 100}}]
-    }}
-  ]
-}}
-"""
+""" + _FOOD_SEARCH_PROMPT_TAIL
 
 def substitute_prompt(food_name: str, restrictions: List[str], goals: str) -> str:
     """Generate food substitute prompt"""
-    restrictions_text = f"Restrictions: {', '.join(restrictions)}" if restrictions else ""
-    return f"""
-Find 3-4 healthier alternatives for: "{food_name}"
-Goal: {goals}
-{restrictions_text}
+    return _substitute_prompt(food_name, tuple(restrictions or ()), goals)
 
-Return ONLY valid JSON:
-{{
-  "original_food": "{food_name}",
+_SUBSTITUTE_PROMPT_TAIL = """
   "substitutes": [
-    {{
+    {
       "food": "substitute name",
       "reason": "why it's better",
       "nutrition_comparison": "specific comparison",
       "availability": "easy/moderate/specialty"
-    }}
+    }
   ]
-}}
+}
 """
 
-def recipe_generation_prompt(target_macros: Dict[str, float], dietary_restrictions: List[str], user_context: Dict[str, Any]) -> str:
-    """Generate recipe creation prompt"""
-    cuisine_text = f"Cuisine: {user_context.get('cuisines', ['Any'])[0]}" if user_context.get('cuisines') else "Cuisine: Any"
-    restrictions_text = f"Dietary restrictions: {', '.join(dietary_restrictions)}" if dietary_restrictions else ""
-    
+@lru_cache(maxsize=256)
+def _substitute_prompt(food_name: str, restrictions: Tuple[str, ...], goals: str) -> str:
+    restrictions_text = f"Restrictions: {', '.join(restrictions)}" if restrictions else ""
     return f"""
-Create a personalized recipe that matches these exact specifications:
-
-Target Macros:
-- Protein: {target_macros.get('protein', 0)}g
-- Carbs: {target_macros.get('carbs', 0)}g  
-- Fat: {target_macros.get('fat', 0)}g
-- Calories: {target_macros.get('calories', 0)}
-
-Requirements:
-{cuisine_text}
+Find 3-4 healthier alternatives for: "{food_name}"
+Goal: {goals}
 {restrictions_text}
 
-User Context:
-- Likes: {', '.join(user_context.get('likes', [])[:3])}
-- Dislikes: {', '.join(user_context.get('dislikes', [])[:3])}
-- Allergies: {', '.join(user_context.get('allergies', []))}
+Return ONLY valid JSON:
+{{
+  "original_food": "{food_name}",""" + _SUBSTITUTE_PROMPT_TAIL
+
+_RECIPE_PROMPT_TAIL = """
 
 Create a complete recipe that hits these macros within 5% accuracy.
 
 Return ONLY valid JSON:
-{{
+{
   "recipe_name": "Delicious Recipe Name",
   "description": "Brief appetizing description",
   "ingredients": [
-    {{"name": "chicken breast", "amount": "6 oz", "grams": 170}},
-    {{"name": "brown rice", "amount": "1/2 cup dry", "grams": 95}}
+    {"name": "chicken breast", "amount": "6 oz", "grams": 170},
+    {"name": "brown rice", "amount": "1/2 cup dry", "grams": 95}
   ],
   "instructions": [
     "Step 1: Detailed instruction",
     "Step 2: Next step"
   ],
-  "nutrition_info": {{
+  "nutrition_info": {
     "calories": 420,
     "protein": 30.2,
     "carbs": 39.8,
     "fat": 15.1,
     "fiber": 4.2
-  }},
+  },
   "prep_time": 15,
   "cook_time": 20,
   "tags": ["high-protein", "healthy", "quick"],
   "tips": ["Optional cooking tip", "Storage suggestion"]
-}}
+}
 """
 
-def dinner_prediction_prompt(current_intake: Dict[str, float], daily_targets: Dict[str, float], user_context: Dict[str, Any]) -> str:
-    """Generate dinner prediction prompt"""
-    # Calculate remaining needs
-    remaining_needs = {}
-    for macro, target in daily_targets.items():
-        current = current_intake.get(macro, 0)
-        remaining_needs[macro] = max(0, target - current)
+def recipe_generation_prompt(target_macros: Dict[str, float], dietary_restrictions: List[str], user_context: Dict[str, Any]) -> str:
+    """Generate recipe creation prompt"""
+    cuisine_text = f"Cuisine: {user_context.get('cuisines', ['Any'])[0]}" if user_context.get('cuisines') else "Cuisine: Any"
+    restrictions_text = f"Dietary restrictions: {', '.join(dietary_restrictions)}" if dietary_restrictions else ""
     
     return f"""
-Predict the optimal dinner for this user based on their current intake:
+Create a personalized recipe that matches these exact specifications:
 
-Current Intake Today: {current_intake}
-Daily Targets: {daily_targets}
-Remaining Needs: {remaining_needs}
+Target Macros:
+- Protein: {target_macros.get('protein', 0)}g
+- Carbs: {target_macros.get('carbs', 0)}g  
+- Fat: {target_macros.get('fat', 0)}g
+- Calories: {target_macros.get('calories', 0)}
 
-User Preferences:
-- Likes: {', '.join(user_context.get('likes', []))}
-- Cuisines: {', '.join(user_context.get('cuisines', []))}
-- Allergies: {', '.join(user_context.get('allergies', []))}
+Requirements:
+{cuisine_text}
+{restrictions_text}
+
+User Context:
+- Likes: {', '.join(user_context.get('likes', [])[:3])}
+- Dislikes: {', '.join(user_context.get('dislikes', [])[:3])}
+- Allergies: {', '.join(user_context.get('allergies', []))}""" + _RECIPE_PROMPT_TAIL
+
+def calculate_remaining_needs(current_intake: Dict[str, float], daily_targets: Dict[str, float]) -> Dict[str, float]:
+    """Calculate what is left of each daily target after today's intake"""
+    return {macro: max(0, target - current_intake.get(macro, 0)) for macro, target in daily_targets.items()}
+
+_DINNER_PREDICTION_PROMPT_TAIL = """
 
 Create 3 dinner suggestions that fill the remaining macro gaps.
 
 Return ONLY valid JSON:
-{{
+{
   "reasoning": "Why these suggestions make sense for their remaining needs",
   "suggestions": [
-    {{
+    {
       "meal_name": "Salmon with Sweet Potato",
       "description": "Grilled salmon with roasted sweet potato and steamed broccoli",
-      "macros": {{"protein": 35, "carbs": 25, "fat": 18, "calories": 380}},
-      "covers_needs": {{"protein": 85, "carbs": 60, "fat": 40}},
+      "macros": {"protein": 35, "carbs": 25, "fat": 18, "calories": 380},
+      "covers_needs": {"protein": 85, "carbs": 60, "fat": 40},
       "prep_time": 25,
       "why_perfect": "Fills your protein gap perfectly and adds healthy fats"
-    }}
+    }
   ],
   "backup_options": [
-    {{
+    {
       "meal_name": "Quick Protein Smoothie",
       "description": "Greek yogurt, banana, protein powder, almond butter",
       "prep_time": 5,
       "why_good": "Super quick if you're in a hurry"
-    }}
+    }
   ]
-}}
+}
 """
 
-def time_travel_prompt(current_pattern: Dict[str, Any], target_goal: Dict[str, Any], user_context: Dict[str, Any]) -> str:
-    """Generate nutrition time travel prompt"""
+def dinner_prediction_prompt(
+    current_intake: Dict[str, float],
+    daily_targets: Dict[str, float],
+    user_context: Dict[str, Any],
+    remaining_needs: Optional[Dict[str, float]] = None
+) -> str:
+    """Generate dinner prediction prompt"""
+    if remaining_needs is None:
+        remaining_needs = calculate_remaining_needs(current_intake, daily_targets)
+    
     return f"""
-Create a nutrition time travel analysis for this user:
+Predict the optimal dinner for this user based on their current intake:
 
-Current Pattern (last 30 days):
-{current_pattern}
+Current Intake Today: {current_intake}
+Daily Targets: {daily_targets}
+Remaining Needs: {remaining_needs}
 
-Goal: {target_goal}
+User Preferences:
+- Likes: {', '.join(user_context.get('likes', []))}
+- Cuisines: {', '.join(user_context.get('cuisines', []))}
+- Allergies: {', '.join(user_context.get('allergies', []))}""" + _DINNER_PREDICTION_PROMPT_TAIL
 
-User Context:
-- Activity Level: {user_context.get('activity', 'normal')}
-- Preferences: {', '.join(user_context.get('likes', []))}
-- Restrictions: {', '.join(user_context.get('allergies', []))}
+_TIME_TRAVEL_PROMPT_TAIL = """
 
 Create a detailed time travel analysis.
 
 Return ONLY valid JSON:
-{{
-  "projected_outcome": {{
+{
+  "projected_outcome": {
     "30_day_weight_change": -2.5,
     "body_composition_change": "2 lbs muscle gain, 4.5 lbs fat loss",
     "energy_levels": "Significantly improved",
     "health_markers": "Improved cholesterol, stable blood sugar"
-  }},
+  },
   "recommended_changes": [
-    {{
+    {
       "change": "Increase protein to 120g daily",
       "reason": "Support muscle growth and satiety",
       "impact": "15% faster progress toward goal"
-    }}
+    }
   ],
   "timeline": [
-    {{
+    {
       "week": 1,
       "focus": "Establish protein baseline",
       "target_calories": 2000,
       "expected_result": "Increased energy, reduced cravings"
-    }}
+    }
   ],
   "confidence_score": 0.78,
   "key_insights": [
     "Your current consistency is excellent - 87% tracking rate",
     "Increasing protein by 20g daily will accelerate fat loss by 30%"
   ]
-}}
+}
 """
 
+def time_travel_prompt(current_pattern: Dict[str, Any], target_goal: Dict[str, Any], user_context: Dict[str, Any]) -> str:
+    """Generate nutrition time travel prompt"""
+    return f"""
+Create a nutrition time travel analysis for this user:
+
+Current Pattern (last 30 days):
+{current_pattern}
+
+Goal: {target_goal}
+
+User Context:
+- Activity Level: {user_context.get('activity', 'normal')}
+- Preferences: {', '.join(user_context.get('likes', []))}
+- Restrictions: {', '.join(user_context.get('allergies', []))}""" + _TIME_TRAVEL_PROMPT_TAIL
+
 # ============ RESPONSE PARSERS ============
 def parse_json_response(response: str) -> Optional[Dict[str, Any]]:
     """Parse JSON response with common cleaning and validation"""
     try:
-        response = response.strip()
-        if response.startswith('```json'):
-            response = response[7:]
-        if response.endswith('```'):
-            response = response[:-3]
-        
-        parsed = json.loads(response.strip())
+        response = response.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+        if not response or response[0] not in "{[":
+            # Prose or an empty reply can never parse, so skip the parser entirely
+            return None
+        try:
+            parsed = orjson.loads(response)
+        except orjson.JSONDecodeError:
+            # Bare NaN/Infinity tokens are rejected by orjson but accepted by the stdlib parser
+            parsed = json.loads(response)
         return fix_nan_values(parsed)
     except Exception as e:
-        print(f"JSON parsing error: {str(e)}")
+        logger.warning("JSON parsing error: %s", e)
         return None
 
+_isnan = math.isnan
+
 def fix_nan_values(obj):
-    """Recursively fix NaN values in parsed JSON"""
-    if isinstance(obj, dict):
-        return {k: fix_nan_values(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [fix_nan_values(item) for item in obj]
-    elif isinstance(obj, float) and (obj != obj):  # NaN check
-        return 0.0
-    elif obj in ["NaN", "nan"]:
+    """Recursively fix NaN values in parsed JSON, returning clean subtrees unchanged"""
+    obj_type = type(obj)
+    if obj_type is dict:
+        fixed = None
+        for key, value in obj.items():
+            new_value = fix_nan_values(value)
+            if new_value is not value:
+                if fixed is None:
+                    fixed = dict(obj)
+                fixed[key] = new_value
+        return obj if fixed is None else fixed
+    if obj_type is list:
+        fixed = None
+        for index, item in enumerate(obj):
+            new_item = fix_nan_values(item)
+            if new_item is not item:
+                if fixed is None:
+                    fixed = list(obj)
+                fixed[index] = new_item
+        return obj if fixed is None else fixed
+    if obj_type is float:
+        return 0.0 if _isnan(obj) else obj
+    if obj_type is str and (obj == "NaN" or obj == "nan"):
         return 0.0
     return obj
 
@@ -513,51 +599,62 @@ def validate_nutrition_response(data: Dict[str, Any]) -> Dict[str, Any]:
     
     return data
 
+_REQUIRED_SUGGESTION_FIELDS = (
+    ("meal_idea", "Nutritious Meal"),
+    ("description", "Balanced meal with good nutrition"),
+    ("total_calories", 300),
+    ("protein_provided", 15.0),
+    ("carbs_provided", 20.0),
+    ("fat_provided", 10.0),
+    ("meal_type", "snack"),
+    ("easy_to_make", True),
+    ("why_perfect", "Great for your nutrition goals"),
+)
+_NUMERIC_SUGGESTION_FIELDS = (
+    ("total_calories", 300),
+    ("protein_provided", 15.0),
+    ("carbs_provided", 20.0),
+    ("fat_provided", 10.0),
+)
+_OLD_FORMAT_FIELDS = ("food", "serving_size", "amount_provided", "easy_to_find")
+
 def ensure_new_suggestion_format(suggestion: Dict[str, Any]):
     """Ensure suggestion uses new format"""
-    required_fields = {
-        "meal_idea": "Nutritious Meal",
-        "description": "Balanced meal with good nutrition",
-        "total_calories": 300,
-        "protein_provided": 15.0,
-        "carbs_provided": 20.0,
-        "fat_provided": 10.0,
-        "percentage_coverage": {"protein": 13, "carbs": 8, "fat": 14},
-        "meal_type": "snack",
-        "easy_to_make": True,
-        "why_perfect": "Great for your nutrition goals"
-    }
-    
-    for field, default_value in required_fields.items():
-        if field not in suggestion:
-            suggestion[field] = default_value
+    setdefault = suggestion.setdefault
+    for field, default_value in _REQUIRED_SUGGESTION_FIELDS:
+        setdefault(field, default_value)
+    if "percentage_coverage" not in suggestion:
+        # Mutable default, so every suggestion gets its own copy
+        suggestion["percentage_coverage"] = {"protein": 13, "carbs": 8, "fat": 14}
     
     # Remove any old format fields that might still exist
-    old_format_fields = ["food", "serving_size", "amount_provided", "easy_to_find"]
-    for old_field in old_format_fields:
-        if old_field in suggestion:
-            del suggestion[old_field]
+    pop = suggestion.pop
+    for old_field in _OLD_FORMAT_FIELDS:
+        pop(old_field, None)
     
     # Validate numeric values
-    for key in ["total_calories", "protein_provided", "carbs_provided", "fat_provided"]:
+    for key, default_value in _NUMERIC_SUGGESTION_FIELDS:
         try:
-            suggestion[key] = float(suggestion[key])
-            if suggestion[key] != suggestion[key]:  # NaN check
-                suggestion[key] = required_fields[key]
+            value = float(suggestion[key])
+            suggestion[key] = default_value if value != value else value  # NaN check
         except (ValueError, TypeError):
-            suggestion[key] = required_fields[key]
+            suggestion[key] = default_value
 
 # ============ USER CONTEXT HELPERS ============
+def _cap(items, limit: int):
+    """Return items trimmed to limit, skipping the copy when already short enough"""
+    return items if len(items) <= limit else items[:limit]
+
 def build_user_context(profile) -> Dict[str, Any]:
     """Build user context from profile for AI personalization"""
     if not profile:
         return {}
     
     return {
-        "likes": (profile.favorite_foods or [])[:5],
-        "dislikes": (profile.disliked_foods or [])[:3],
-        "cuisines": (profile.cuisine_preferences or [])[:3],
-        "allergies": (profile.allergies or [])[:5],
+        "likes": _cap(profile.favorite_foods or (), 5),
+        "dislikes": _cap(profile.disliked_foods or (), 3),
+        "cuisines": _cap(profile.cuisine_preferences or (), 3),
+        "allergies": _cap(profile.allergies or (), 5),
         "activity": profile.activity_level or "normal",
         "goals": profile.nutrition_goals or {},
         "ai_personality_type": profile.ai_personality_type or "supportive",
@@ -566,38 +663,41 @@ def build_user_context(profile) -> Dict[str, Any]:
     }
 
 # ============ SIMPLE CACHING ============
-# Simple in-memory cache for substitutes
-substitute_cache = {}
-substitute_cache_lock = asyncio.Lock()
+# Simple in-memory LRU cache for substitutes
+substitute_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+substitute_cache_lock = threading.Lock()
 MAX_CACHE_SIZE = 100
 
 def get_cached_substitute(cache_key: str) -> Optional[Dict[str, Any]]:
     """Get cached substitute result (thread-safe)"""
-    async def _get():
-        async with substitute_cache_lock:
-            return substitute_cache.get(cache_key)
-    import asyncio
-    return asyncio.run(_get())
+    with substitute_cache_lock:
+        result = substitute_cache.get(cache_key)
+        if result is not None:
+            substitute_cache.move_to_end(cache_key)
+        return result
 
 def cache_substitute(cache_key: str, result: Dict[str, Any]):
     """Cache substitute result (thread-safe)"""
-    async def _cache():
-        async with substitute_cache_lock:
-            if len(substitute_cache) < MAX_CACHE_SIZE:
-                substitute_cache[cache_key] = result
-    import asyncio
-    asyncio.run(_cache())
+    with substitute_cache_lock:
+        substitute_cache[cache_key] = result
+        substitute_cache.move_to_end(cache_key)
+        if len(substitute_cache) > MAX_CACHE_SIZE:
+            substitute_cache.popitem(last=False)
 
 def clear_substitute_cache():
     """Clear substitute cache (thread-safe)"""
-    async def _clear():
-        async with substitute_cache_lock:
-            global substitute_cache
-            substitute_cache = {}
-    import asyncio
-    asyncio.run(_clear())
+    with substitute_cache_lock:
+        substitute_cache.clear()
 
 # ============ VALIDATION HELPERS ============
+# Placeholder / keyboard-mash inputs that can never describe a meal. The symbol class is
+# ASCII-only on purpose: emoji such as "🍕🍔" are real meal descriptions and must reach the model.
+NON_FOOD_INPUT_RE = re.compile(
+    r"^(?:test(?:ing)?|hello|hi+|hey|ok(?:ay)?|yes|no|none|nothing|null|undefined|n/?a|"
+    r"asdf\w*|qwerty\w*|lol+|idk|[\s\d" + re.escape(string.punctuation) + r"]+)$",
+    re.IGNORECASE
+)
+
 def validate_meal_type(meal_type: str) -> str:
     """Validate and fix meal type"""
     allowed_types = ["breakfast", "lunch", "dinner", "snack"]
@@ -605,87 +705,102 @@ def validate_meal_type(meal_type: str) -> str:
         return meal_type.lower()
     return "snack"  # Safe default
 
+_NUMBER_TYPES = (int, float)
+
 def validate_macros(macros: Dict[str, float]) -> Dict[str, float]:
     """Validate and fix macro values"""
     validated = {}
     for key, value in macros.items():
-        try:
-            validated[key] = max(0, float(value)) if value is not None else 0.0
-        except (ValueError, TypeError):
-            validated[key] = 0.0
+        # Plain numbers skip conversion; comparisons clamp negatives and NaN to zero
+        if type(value) not in _NUMBER_TYPES:
+            try:
+                value = float(value) if value is not None else 0.0
+            except (ValueError, TypeError):
+                value = 0.0
+        validated[key] = float(value) if value > 0 else 0.0
     return validated
 
 def validate_percentage_coverage(coverage: Dict[str, Any]) -> Dict[str, int]:
     """Validate percentage coverage values"""
     validated = {}
     for key, value in coverage.items():
-        try:
-            validated[key] = max(0, min(100, int(float(value))))
-        except (ValueError, TypeError):
-            validated[key] = 0
+        if type(value) not in _NUMBER_TYPES:
+            try:
+                value = float(value)
+            except (ValueError, TypeError):
+                value = 0
+        validated[key] = 100 if value >= 100 else int(value) if value > 0 else 0
     return validated
 
 # ============ ERROR HANDLING HELPERS ============
+# Built once; callers get a top-level copy because they add keys such as analysis_method
+_FALLBACK_MEAL_RESPONSE = {
+    "meal_name": "Unknown Meal",
+    "meal_type": "snack",
+    "foods": [],
+    "total_calories": 0,
+    "analysis_method": "error_fallback"
+}
+
+_FALLBACK_NUTRITION_RESPONSE = {
+    "overall_summary": "You're making great progress! Let's focus on getting some quality protein today.",
+    "nutrients_to_focus_on": [{
+        "nutrient": "protein",
+        "current_intake": 0,
+        "target": 120,
+        "deficit": 120,
+        "suggestions": [{
+            "meal_idea": "Greek Yogurt Power Bowl",
+            "description": "1 cup Greek yogurt + granola + fresh berries + almond butter drizzle",
+            "total_calories": 340,
+            "protein_provided": 25.0,
+            "carbs_provided": 28.0,
+            "fat_provided": 12.0,
+            "percentage_coverage": {"protein": 21, "carbs": 11, "fat": 17},
+            "meal_type": "snack",
+            "easy_to_make": True,
+            "why_perfect": "Perfect protein boost that covers 21% of your daily needs in one delicious bowl"
+        }],
+        "why_important": "Protein helps build muscle and keeps you satisfied longer"
+    }],
+    "achievements": ["You're building healthy tracking habits!"],
+    "tips": ["Focus on adding protein to your next meal or snack"]
+}
+
 def create_fallback_meal_response() -> Dict[str, Any]:
     """Create fallback meal response for errors"""
-    return {
-        "meal_name": "Unknown Meal",
-        "meal_type": "snack",
-        "foods": [],
-        "total_calories": 0,
-        "analysis_method": "error_fallback"
-    }
+    return {**_FALLBACK_MEAL_RESPONSE, "foods": []}
 
 def create_fallback_nutrition_response() -> Dict[str, Any]:
     """Create fallback nutrition response for errors"""
-    return {
-        "overall_summary": "You're making great progress! Let's focus on getting some quality protein today.",
-        "nutrients_to_focus_on": [{
-            "nutrient": "protein",
-            "current_intake": 0,
-            "target": 120,
-            "deficit": 120,
-            "suggestions": [{
-                "meal_idea": "Greek Yogurt Power Bowl",
-                "description": "1 cup Greek yogurt + granola + fresh berries + almond butter drizzle",
-                "total_calories": 340,
-                "protein_provided": 25.0,
-                "carbs_provided": 28.0,
-                "fat_provided": 12.0,
-                "percentage_coverage": {"protein": 21, "carbs": 11, "fat": 17},
-                "meal_type": "snack",
-                "easy_to_make": True,
-                "why_perfect": "Perfect protein boost that covers 21% of your daily needs in one delicious bowl"
-            }],
-            "why_important": "Protein helps build muscle and keeps you satisfied longer"
-        }],
-        "achievements": ["You're building healthy tracking habits!"],
-        "tips": ["Focus on adding protein to your next meal or snack"]
-    }
+    return dict(_FALLBACK_NUTRITION_RESPONSE)
 
 # ============ UTILITY FUNCTIONS ============
+# Characters stripped by clean_string
+_CLEAN_RE = re.compile(r'[^\w\s-]')
+
 def generate_cache_key(*args) -> str:
     """Generate cache key from arguments"""
-    import hashlib
-    key_string = ":".join(str(arg) for arg in args)
-    return hashlib.md5(key_string.encode()).hexdigest()
+    key_hash = hashlib.blake2b(digest_size=16)
+    for arg in args:
+        key_hash.update(str(arg).encode())
+        key_hash.update(b"\x00")
+    return key_hash.hexdigest()
 
 def format_time(seconds: int) -> str:
     """Format seconds into human readable time"""
     if seconds < 60:
         return f"{seconds} seconds"
-    elif seconds < 3600:
+    if seconds < 3600:
         return f"{seconds // 60} minutes"
-    else:
-        hours = seconds // 3600
-        minutes = (seconds % 3600) // 60
-        return f"{hours}h {minutes}m"
+    hours, remainder = divmod(seconds, 3600)
+    return f"{hours}h {remainder // 60}m"
 
 def clean_string(text: str) -> str:
     """Clean string for safe processing"""
     if not text:
         return ""
-    return re.sub(r'[^\w\s-]', '', text).strip()
+    return _CLEAN_RE.sub('', text).strip()
 
 def truncate_text(text: str, max_length: int = 100) -> str:
     """Truncate text to max length"""
@@ -699,9 +814,11 @@ def get_current_timestamp() -> float:
 
 def calculate_percentage(part: float, whole: float) -> int:
     """Calculate percentage with safe division"""
-    if whole == 0:
+    if not whole:
         return 0
-    return min(100, max(0, int((part / whole) * 100)))
+    ratio = (part / whole) * 100
+    # Clamp on the float so NaN and infinities never reach int()
+    return 0 if not ratio >= 0 else 100 if ratio >= 100 else int(ratio)
 
 # ============ AI RESPONSE QUALITY CHECKS ============
 def is_valid_json_structure(data: Any, required_keys: List[str]) -> bool:
@@ -752,98 +869,139 @@ def validate_recipe_response(data: Dict[str, Any]) -> Dict[str, Any]:
     
     return data
 
-def create_nutrition_advice_prompt(food_log: List[Dict], daily_targets: Dict[str, float], user_context: Optional[Dict] = None) -> str:
-    """Create simplified, reliable nutrition advice prompt"""
-    total_calories = sum(item.get("calories", 0) for item in food_log)
-    total_protein = sum(item.get("protein_g", 0) for item in food_log)
-    total_carbs = sum(item.get("carbs_g", 0) for item in food_log)
-    total_fat = sum(item.get("fat_g", 0) for item in food_log)
-    calories_needed = max(0, daily_targets.get("calories", 2000) - total_calories)
-    protein_needed = max(0, daily_targets.get("protein_g", 120) - total_protein)
-    carbs_needed = max(0, daily_targets.get("carbs_g", 250) - total_carbs)
-    fat_needed = max(0, daily_targets.get("fat_g", 70) - total_fat)
-    user_prefs = ""
-    if user_context:
-        likes = user_context.get("favorite_foods", [])
-        dislikes = user_context.get("disliked_foods", [])
-        allergies = user_context.get("allergies", [])
-        if likes:
-            user_prefs += f"User likes: {', '.join(likes[:3])}\n"
-        if dislikes:
-            user_prefs += f"User avoids: {', '.join(dislikes[:3])}\n"
-        if allergies:
-            user_prefs += f"ALLERGIES (avoid completely): {', '.join(allergies)}\n"
-    return f"""
+# Built once at import; the response shape is enforced by NUTRITION_ADVICE_RESPONSE_SCHEMA, not shown in the prompt
+_NUTRITION_ADVICE_PROMPT_TEMPLATE: Final[Template] = Template("""
 You are a nutrition coach. Analyze this user's daily intake and provide specific meal suggestions.
 
 CURRENT INTAKE TODAY:
-- Total calories: {total_calories}
-- Protein: {total_protein}g
-- Carbs: {total_carbs}g
-- Fat: {total_fat}g
+- Total calories: ${total_calories}
+- Protein: ${total_protein}g
+- Carbs: ${total_carbs}g
+- Fat: ${total_fat}g
 
 DAILY TARGETS:
-- Calories: {daily_targets.get('calories', 2000)}
-- Protein: {daily_targets.get('protein_g', 120)}g
-- Carbs: {daily_targets.get('carbs_g', 250)}g
-- Fat: {daily_targets.get('fat_g', 70)}g
+- Calories: ${calories_target}
+- Protein: ${protein_target}g
+- Carbs: ${carbs_target}g
+- Fat: ${fat_target}g
 
 REMAINING NEEDS:
-- Calories: {calories_needed}
-- Protein: {protein_needed}g
-- Carbs: {carbs_needed}g
-- Fat: {fat_needed}g
+- Calories: ${calories_needed}
+- Protein: ${protein_needed}g
+- Carbs: ${carbs_needed}g
+- Fat: ${fat_needed}g
 
-{user_prefs}
+${user_prefs}
 
 Give 2 specific meal suggestions that help meet their remaining needs.
 
-RETURN EXACTLY THIS JSON FORMAT:
-{{
-  "overall_summary": "Brief encouraging summary about their progress and what they need",
-  "nutrients_to_focus_on": [
-    {{
-      "nutrient": "protein",
-      "current_intake": {total_protein},
-      "target": {daily_targets.get('protein_g', 120)},
-      "deficit": {protein_needed},
-      "suggestions": [
-        {{
-          "meal_idea": "Greek Yogurt Bowl",
-          "description": "1 cup Greek yogurt + granola + fresh berries + almonds",
-          "total_calories": 320,
-          "protein_provided": 20.0,
-          "carbs_provided": 25.0,
-          "fat_provided": 12.0,
-          "percentage_coverage": {{"protein": 17, "carbs": 10, "fat": 17}},
-          "meal_type": "snack",
-          "easy_to_make": true,
-          "why_perfect": "High protein snack that covers 17% of daily protein needs"
-        }},
-        {{
-          "meal_idea": "Chicken Rice Bowl", 
-          "description": "4oz grilled chicken + 1/2 cup brown rice + vegetables",
-          "total_calories": 400,
-          "protein_provided": 30.0,
-          "carbs_provided": 35.0,
-          "fat_provided": 8.0,
-          "percentage_coverage": {{"protein": 25, "carbs": 14, "fat": 11}},
-          "meal_type": "lunch",
-          "easy_to_make": true,
-          "why_perfect": "Balanced meal providing 25% of daily protein target"
-        }}
-      ],
-      "why_important": "Protein helps build muscle and keeps you satisfied"
-    }}
-  ],
-  "achievements": ["Great job tracking your nutrition today!"],
-  "tips": ["Focus on protein with your next meal", "Try one of the suggested meals above"]
-}}
-
-CRITICAL RULES:
-1. Use EXACT field names shown above
-2. Give realistic calorie and macro amounts
-3. Calculate percentages accurately
-4. Make suggestions specific and actionable
-5. Return ONLY valid JSON, no extra text
-"""
\ No newline at end of file
+Return JSON with an overall summary, the nutrients to focus on with their suggestions, achievements and tips.
+Rules: realistic calories and macros, accurate percentages, specific actionable meals.
+""")
+
+def _strict_object(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON Schema object in the shape OpenAI strict structured outputs require"""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+_NUTRITION_SUGGESTION_SCHEMA = _strict_object({
+    "meal_idea": {"type": "string"},
+    "description": {"type": "string"},
+    "total_calories": {"type": "number"},
+    "protein_provided": {"type": "number"},
+    "carbs_provided": {"type": "number"},
+    "fat_provided": {"type": "number"},
+    "percentage_coverage": _strict_object({
+        "protein": {"type": "integer"},
+        "carbs": {"type": "integer"},
+        "fat": {"type": "integer"},
+    }),
+    "meal_type": {"type": "string", "enum": ["breakfast", "lunch", "dinner", "snack"]},
+    "easy_to_make": {"type": "boolean"},
+    "why_perfect": {"type": "string"},
+})
+
+NUTRITION_ADVICE_RESPONSE_SCHEMA: Final[Dict[str, Any]] = _strict_object({
+    "overall_summary": {"type": "string"},
+    "nutrients_to_focus_on": {
+        "type": "array",
+        "items": _strict_object({
+            "nutrient": {"type": "string"},
+            "current_intake": {"type": "number"},
+            "target": {"type": "number"},
+            "deficit": {"type": "number"},
+            "suggestions": {"type": "array", "items": _NUTRITION_SUGGESTION_SCHEMA},
+            "why_important": {"type": "string"},
+        }),
+    },
+    "achievements": {"type": "array", "items": {"type": "string"}},
+    "tips": {"type": "array", "items": {"type": "string"}},
+})
+
+def create_nutrition_advice_prompt(food_log: List[Dict], daily_targets: Dict[str, float], user_context: Optional[Dict] = None) -> str:
+    """Create simplified, reliable nutrition advice prompt"""
+    totals = total_food_log_macros(food_log)
+    user_context = user_context or {}
+    # Intake is rounded to 0.1 so near-identical logs share a cached rendering
+    return _nutrition_advice_prompt(
+        round(totals["calories"], 1),
+        round(totals["protein_g"], 1),
+        round(totals["carbs_g"], 1),
+        round(totals["fat_g"], 1),
+        daily_targets.get("calories", 2000),
+        daily_targets.get("protein_g", 120),
+        daily_targets.get("carbs_g", 250),
+        daily_targets.get("fat_g", 70),
+        tuple(user_context.get("favorite_foods") or ())[:3],
+        tuple(user_context.get("disliked_foods") or ())[:3],
+        tuple(user_context.get("allergies") or ()),
+    )
+
+@lru_cache(maxsize=1024)
+def _nutrition_advice_prompt(
+    total_calories: float,
+    total_protein: float,
+    total_carbs: float,
+    total_fat: float,
+    calories_target: float,
+    protein_target: float,
+    carbs_target: float,
+    fat_target: float,
+    likes: Tuple[str, ...],
+    dislikes: Tuple[str, ...],
+    allergies: Tuple[str, ...],
+) -> str:
+    user_prefs = ""
+    if likes:
+        user_prefs += f"User likes: {', '.join(likes)}\n"
+    if dislikes:
+        user_prefs += f"User avoids: {', '.join(dislikes)}\n"
+    if allergies:
+        user_prefs += f"ALLERGIES (avoid completely): {', '.join(allergies)}\n"
+    return _NUTRITION_ADVICE_PROMPT_TEMPLATE.substitute(
+        total_calories=total_calories,
+        total_protein=total_protein,
+        total_carbs=total_carbs,
+        total_fat=total_fat,
+        calories_target=calories_target,
+        protein_target=protein_target,
+        carbs_target=carbs_target,
+        fat_target=fat_target,
+        calories_needed=max(0, calories_target - total_calories),
+        protein_needed=max(0, protein_target - total_protein),
+        carbs_needed=max(0, carbs_target - total_carbs),
+        fat_needed=max(0, fat_target - total_fat),
+        user_prefs=user_prefs,
+    )
+
+def parse_nutrition_advice_response(raw: Union[str, bytes]) -> Optional[Dict[str, Any]]:
+    """Parse a schema-constrained nutrition advice reply, salvaging fenced or NaN-laden output"""
+    try:
+        parsed = fix_nan_values(orjson.loads(raw))
+    except orjson.JSONDecodeError:
+        parsed = parse_json_response(raw.decode() if isinstance(raw, bytes) else raw)
+    return parsed if isinstance(parsed, dict) else None